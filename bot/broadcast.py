@@ -0,0 +1,365 @@
+"""
+Ommaviy xabar yuborish (broadcast) ishlari.
+
+Ish va har bir qabul qiluvchining holati bazada saqlanadi, xabarlar
+Telegram limitiga moslangan umumiy token bucket orqali bir nechta
+threadda yuboriladi va bot qayta ishga tushganda ish davom ettiriladi.
+"""
+
+import os
+import uuid
+import socket
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from telebot.apihelper import ApiHTTPException, ApiTelegramException
+
+from storage import db_pool
+
+# Telegram: ~30 xabar/s; qolgan qismi oddiy handlerlar uchun zaxira
+BROADCAST_RATE = float(os.getenv('BROADCAST_RATE', '25'))
+BROADCAST_WORKERS = int(os.getenv('BROADCAST_WORKERS', '8'))
+BROADCAST_BATCH_SIZE = int(os.getenv('BROADCAST_BATCH_SIZE', '200'))
+BROADCAST_MAX_ATTEMPTS = int(os.getenv('BROADCAST_MAX_ATTEMPTS', '5'))
+# Bitta qabul qiluvchi uchun ketma-ket 429 (retry_after) kutishlari chegarasi
+BROADCAST_MAX_RATE_LIMITED = int(os.getenv('BROADCAST_MAX_RATE_LIMITED', '10'))
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv('BROADCAST_PROGRESS_INTERVAL', '5'))
+# Ishni yuborayotgan jarayon lease ni partiya davomida ham yangilab turadi; muddati o'tsa boshqa jarayon oladi
+BROADCAST_LEASE_TTL = float(os.getenv('BROADCAST_LEASE_TTL', '120'))
+
+# Shu jarayonning lease egasi nomi (bir nechta bot jarayoni bir bazada ishlaganda)
+PROCESS_ID = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+class TokenBucket:
+    """Soniyasiga ``rate`` ta ruxsat beradi; ``pause`` barcha yuboruvchilarni birga to'xtatadi."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self._updated_at:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                    self._updated_at = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+                else:
+                    # pause() kelajakdagi vaqtni qo'ygan
+                    wait = self._updated_at - now
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._tokens = 0
+            self._updated_at = max(self._updated_at, time.monotonic() + seconds)
+
+
+telegram_bucket = TokenBucket(BROADCAST_RATE)
+
+
+def deliver(bot, user_id: int, kind: str, text: str, photo: Optional[str] = None) -> Tuple[Optional[str], int]:
+    """Bitta xabarni yuboradi: (xato yoki None, urinishlar soni).
+
+    429 da Telegram bergan ``retry_after`` kutiladi (urinish hisoblanmaydi,
+    lekin BROADCAST_MAX_RATE_LIMITED martadan keyin yakuniy xato),
+    5xx (jumladan proxy qaytargan HTML 502/504) va tarmoq xatolarida
+    eksponensial kutish bilan qayta uriniladi, boshqa 4xx (bloklangan, chat
+    topilmadi) va kutilmagan xatolar shu qabul qiluvchi uchun yakuniy xato -
+    partiyaning qolgan qismi to'xtamaydi.
+    """
+    attempts = 0
+    rate_limited = 0
+    error = None
+    while attempts < BROADCAST_MAX_ATTEMPTS:
+        telegram_bucket.acquire()
+        try:
+            if kind == 'photo':
+                bot.send_photo(user_id, photo, caption=text)
+            else:
+                bot.send_message(user_id, text)
+            return None, attempts + 1
+        except ApiTelegramException as e:
+            if e.error_code == 429:
+                rate_limited += 1
+                if rate_limited > BROADCAST_MAX_RATE_LIMITED:
+                    return e.description, attempts + 1
+                retry_after = (e.result_json.get('parameters') or {}).get('retry_after', 1)
+                telegram_bucket.pause(retry_after)
+                continue
+            attempts += 1
+            error = e.description
+            if e.error_code < 500:
+                return error, attempts
+        except ApiHTTPException as e:
+            attempts += 1
+            error = f"HTTP {e.result.status_code}"
+            if e.result.status_code < 500:
+                return error, attempts
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            attempts += 1
+            error = str(e)
+        except Exception as e:
+            logging.exception(f"Broadcast: kutilmagan xatolik (user_id={user_id}): {e}")
+            return str(e) or type(e).__name__, attempts + 1
+        time.sleep(min(30, 2 ** attempts))
+    return error, attempts
+
+
+# ===== ISHLAR (JOBS) =====
+def create_job(kind: str, text: str, photo: Optional[str] = None, admin_chat_id: Optional[int] = None,
+               user_ids: Optional[List[int]] = None) -> int:
+    """Ish yaratadi; ``user_ids`` berilmasa barcha foydalanuvchilar qabul qiluvchi bo'ladi."""
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO broadcast_jobs (kind, text, photo, admin_chat_id)
+            VALUES (?, ?, ?, ?)
+        ''', (kind, text, photo, admin_chat_id))
+        job_id = cursor.lastrowid
+        if user_ids is None:
+            cursor.execute('INSERT INTO broadcast_recipients (job_id, user_id) SELECT ?, user_id FROM users', (job_id,))
+        else:
+            cursor.executemany('INSERT OR IGNORE INTO broadcast_recipients (job_id, user_id) VALUES (?, ?)',
+                               [(job_id, user_id) for user_id in user_ids])
+        cursor.execute('''
+            UPDATE broadcast_jobs SET total = (SELECT COUNT(*) FROM broadcast_recipients WHERE job_id = ?)
+            WHERE job_id = ?
+        ''', (job_id, job_id))
+    return job_id
+
+
+def get_job(job_id: int) -> Optional[Dict]:
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM broadcast_jobs WHERE job_id = ?', (job_id,))
+        job = cursor.fetchone()
+    return dict(job) if job else None
+
+
+def set_progress_message(job_id: int, message_id: int):
+    with db_pool.connection() as conn:
+        conn.execute('UPDATE broadcast_jobs SET progress_message_id = ? WHERE job_id = ?', (message_id, job_id))
+
+
+def _acquire_lease(job_id: int, owner: str) -> bool:
+    """Ishni ``owner`` ga biriktiradi; boshqa tirik jarayon yuborayotgan bo'lsa False.
+
+    Muddati o'tgan lease olinganda oldingi egasining 'sending' qatorlari 'pending' ga
+    qaytariladi: o'sha partiyadagi xabarlar qayta yuborilishi mumkin (at-least-once).
+    """
+    now = time.time()
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute("SELECT lease_owner, lease_expires FROM broadcast_jobs WHERE job_id = ? AND status = 'running'",
+                       (job_id,))
+        job = cursor.fetchone()
+        if job is None:
+            return False
+        if job['lease_owner'] not in (None, owner) and (job['lease_expires'] or 0) >= now:
+            return False
+        cursor.execute('UPDATE broadcast_jobs SET lease_owner = ?, lease_expires = ? WHERE job_id = ?',
+                       (owner, now + BROADCAST_LEASE_TTL, job_id))
+        if job['lease_owner'] != owner:
+            cursor.execute("UPDATE broadcast_recipients SET status = 'pending' WHERE job_id = ? AND status = 'sending'",
+                           (job_id,))
+    return True
+
+
+def _claim_recipients(job_id: int, owner: str, limit: int) -> List[int]:
+    """Keyingi partiyani 'sending' ga o'tkazib band qiladi; lease boshqa jarayonga o'tgan bo'lsa bo'sh."""
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('''
+            UPDATE broadcast_jobs SET lease_expires = ?
+            WHERE job_id = ? AND status = 'running' AND lease_owner = ?
+        ''', (time.time() + BROADCAST_LEASE_TTL, job_id, owner))
+        if cursor.rowcount != 1:
+            return []
+        cursor.execute('''
+            SELECT user_id FROM broadcast_recipients
+            WHERE job_id = ? AND status = 'pending'
+            LIMIT ?
+        ''', (job_id, limit))
+        user_ids = [row['user_id'] for row in cursor.fetchall()]
+        cursor.executemany("UPDATE broadcast_recipients SET status = 'sending' WHERE job_id = ? AND user_id = ?",
+                           [(job_id, user_id) for user_id in user_ids])
+    return user_ids
+
+
+def _renew_lease(job_id: int, owner: str) -> bool:
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE broadcast_jobs SET lease_expires = ?
+            WHERE job_id = ? AND status = 'running' AND lease_owner = ?
+        ''', (time.time() + BROADCAST_LEASE_TTL, job_id, owner))
+        return cursor.rowcount == 1
+
+
+def _record_results(job_id: int, owner: str, results: List[Tuple[int, Optional[str], int]]) -> bool:
+    """Natijalarni yozadi; lease boshqa jarayonga o'tgan bo'lsa hech narsa yozmaydi va False qaytaradi."""
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('SELECT 1 FROM broadcast_jobs WHERE job_id = ? AND lease_owner = ?', (job_id, owner))
+        if cursor.fetchone() is None:
+            return False
+        counts = {}
+        for status in ('sent', 'failed'):
+            cursor.executemany('''
+                UPDATE broadcast_recipients
+                SET status = ?, attempts = attempts + ?, last_error = ?
+                WHERE job_id = ? AND user_id = ? AND status = 'sending'
+            ''', [(status, attempts, error, job_id, user_id)
+                  for user_id, error, attempts in results if bool(error) == (status == 'failed')])
+            counts[status] = max(cursor.rowcount, 0)
+        cursor.execute('''
+            UPDATE broadcast_jobs SET sent = sent + ?, failed = failed + ?
+            WHERE job_id = ? AND lease_owner = ?
+        ''', (counts['sent'], counts['failed'], job_id, owner))
+    return True
+
+
+def _finish_job(job_id: int, owner: str):
+    with db_pool.connection() as conn:
+        conn.execute('''
+            UPDATE broadcast_jobs SET status = 'done', finished_at = CURRENT_TIMESTAMP, lease_owner = NULL
+            WHERE job_id = ? AND lease_owner = ?
+              AND NOT EXISTS (SELECT 1 FROM broadcast_recipients
+                              WHERE job_id = ? AND status IN ('pending', 'sending'))
+        ''', (job_id, owner, job_id))
+
+
+def format_progress(job: Dict) -> str:
+    if job['status'] == 'done':
+        return (
+            f"✅ <b>Xabar yuborish yakunlandi!</b>\n\n"
+            f"✅ Yuborildi: {job['sent']} ta\n"
+            f"❌ Yuborilmadi: {job['failed']} ta"
+        )
+    return (
+        f"📤 <b>Xabar yuborilmoqda...</b>\n\n"
+        f"👥 Foydalanuvchilar: {job['total']} ta\n"
+        f"✅ Yuborildi: {job['sent']} ta\n"
+        f"❌ Yuborilmadi: {job['failed']} ta\n"
+        f"⏳ Qoldi: {job['total'] - job['sent'] - job['failed']} ta"
+    )
+
+
+class BroadcastRunner:
+    """Ishlarni fon threadlarida bajaradi; yuborishlar umumiy executor va token bucket orqali."""
+
+    def __init__(self, bot, workers: int = BROADCAST_WORKERS, owner: str = PROCESS_ID):
+        self.bot = bot
+        self.owner = owner
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='broadcast')
+        db_pool.reserve(workers)
+        self._active = set()
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+
+    def start(self, job_id: int):
+        with self._lock:
+            if job_id in self._active:
+                return
+            self._active.add(job_id)
+        threading.Thread(target=self._run, args=(job_id,), name=f'broadcast-job-{job_id}', daemon=True).start()
+
+    def resume(self):
+        """Egasiz ishlarni davom ettiradi va keyin ham davriy tekshirib turadi.
+
+        Boshqa (yoki restartdan oldingi shu) jarayon lease i muddati o'tmaguncha ish
+        olinmaydi; o'lgan jarayonning ishi lease tugagach shu tekshiruvda olinadi.
+        """
+        self._resume_orphaned()
+        with self._lock:
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name='broadcast-watcher', daemon=True)
+                self._watcher.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(BROADCAST_LEASE_TTL / 2)
+            try:
+                self._resume_orphaned()
+            except Exception as e:
+                logging.error(f"Broadcast ishlarini tekshirishda xatolik: {e}")
+
+    def _resume_orphaned(self):
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT job_id FROM broadcast_jobs
+                WHERE status = 'running' AND (lease_owner IS NULL OR lease_expires < ?)
+            ''', (time.time(),))
+            job_ids = [row['job_id'] for row in cursor.fetchall()]
+        for job_id in job_ids:
+            logging.info(f"Broadcast ishi davom ettirilmoqda: job_id={job_id}")
+            self.start(job_id)
+
+    def _run(self, job_id: int):
+        try:
+            if not _acquire_lease(job_id, self.owner):
+                logging.info(f"Broadcast ishi boshqa jarayonda: job_id={job_id}")
+                return
+            job = get_job(job_id)
+            last_report = time.monotonic()
+            while True:
+                user_ids = _claim_recipients(job_id, self.owner, BROADCAST_BATCH_SIZE)
+                if not user_ids:
+                    break
+                results = self._deliver_batch(job_id, job, user_ids)
+                if not _record_results(job_id, self.owner, results):
+                    logging.warning(f"Broadcast lease boshqa jarayonga o'tdi: job_id={job_id}")
+                    return
+                if time.monotonic() - last_report >= BROADCAST_PROGRESS_INTERVAL:
+                    self._report(get_job(job_id))
+                    last_report = time.monotonic()
+            _finish_job(job_id, self.owner)
+            job = get_job(job_id)
+            if job['status'] == 'done':
+                self._report(job)
+        except Exception as e:
+            logging.error(f"Broadcast ishida xatolik (job_id={job_id}): {e}")
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+
+    def _deliver_batch(self, job_id: int, job: Dict, user_ids: List[int]) -> List[Tuple[int, Optional[str], int]]:
+        futures = [
+            self._executor.submit(lambda user_id: (user_id, *deliver(self.bot, user_id, job['kind'], job['text'],
+                                                                     job['photo'])), user_id)
+            for user_id in user_ids
+        ]
+        # Partiya (5xx backoff, 429 pauzalari) lease muddatidan uzoq davom etishi mumkin
+        renewed = True
+        while True:
+            _, pending = wait(futures, timeout=BROADCAST_LEASE_TTL / 3)
+            if not pending:
+                return [future.result() for future in futures]
+            if renewed and not _renew_lease(job_id, self.owner):
+                renewed = False
+                logging.warning(f"Broadcast lease ni yangilab bo'lmadi: job_id={job_id}")
+
+    def _report(self, job: Dict):
+        if not job.get('admin_chat_id') or not job.get('progress_message_id'):
+            return
+        try:
+            self.bot.edit_message_text(format_progress(job), job['admin_chat_id'], job['progress_message_id'])
+        except Exception as e:
+            logging.warning(f"Broadcast progressini yangilab bo'lmadi: {e}")
@@ -0,0 +1,69 @@
+"""
+Inline tugmalar uchun callback marshrutlash.
+
+Callback data ``action:arg1:arg2`` ko'rinishida kodlanadi va action nomi
+bo'yicha lug'atdan bir qadamda topiladi; argumentlar ro'yxatdan o'tishda
+berilgan turlarga (int, str) bir marta o'giriladi. Kanal va chatlarda
+qolib ketgan eski ``action_arg1_arg2`` tugmalari ham qo'llab-quvvatlanadi.
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+CALLBACK_SEP = ':'
+
+
+def encode_callback(action: str, *args) -> str:
+    return CALLBACK_SEP.join([action, *(str(arg) for arg in args)])
+
+
+class CallbackRouter:
+    def __init__(self):
+        self._routes: Dict[str, Tuple[Callable, Tuple[Callable, ...]]] = {}
+        # eski format prefiksi -> action
+        self._legacy: Dict[str, str] = {}
+
+    def add(self, action: str, handler: Callable, *arg_types: Callable, legacy: Optional[str] = None):
+        """``handler(call, *args)``; oxirgi argumentlar tushib qolishi mumkin (handler defaultlari)."""
+        if CALLBACK_SEP in action:
+            raise ValueError(f"Action nomida '{CALLBACK_SEP}' bo'lmasligi kerak: {action}")
+        self._routes[action] = (handler, arg_types)
+        self._legacy[legacy or action] = action
+
+    def route(self, action: str, *arg_types: Callable, legacy: Optional[str] = None):
+        def decorator(func):
+            self.add(action, func, *arg_types, legacy=legacy)
+            return func
+        return decorator
+
+    def resolve(self, data: str) -> Optional[Tuple[Callable, List]]:
+        """Handler va o'girilgan argumentlar; action topilmasa None, argumentlar noto'g'ri bo'lsa ValueError."""
+        if CALLBACK_SEP in data:
+            action, rest = data.split(CALLBACK_SEP, 1)
+            route = self._routes.get(action)
+            if route is None:
+                return None
+            return route[0], self._convert(route[1], rest, CALLBACK_SEP)
+
+        action = self._legacy.get(data)
+        if action is not None:
+            return self._routes[action][0], []
+        # Eski format: eng uzun mos prefiks ('admin_view_startup_5' -> 'admin_view_startup')
+        end = len(data)
+        while True:
+            end = data.rfind('_', 0, end)
+            if end <= 0:
+                return None
+            action = self._legacy.get(data[:end])
+            if action is not None:
+                handler, arg_types = self._routes[action]
+                return handler, self._convert(arg_types, data[end + 1:], '_')
+
+    @staticmethod
+    def _convert(arg_types: Tuple[Callable, ...], rest: str, sep: str) -> List:
+        if not arg_types:
+            if rest:
+                raise ValueError(f"Ortiqcha argument: {rest}")
+            return []
+        # Oxirgi argument qolgan qismni oladi (kursor, 'first_name' kabi)
+        values = rest.split(sep, len(arg_types) - 1)
+        return [arg_type(value) for arg_type, value in zip(arg_types, values)]
@@ -0,0 +1,130 @@
+"""
+Updatelarni chat bo'yicha tartibli, chatlar orasida parallel qayta ishlash.
+
+Har bir update chat id bo'yicha N ta navbatdan biriga tushadi: bitta chat
+updatelari doim bitta threadda ketma-ket (filtrlar ham, handler ham)
+bajariladi, turli chatlar esa parallel. Navbatlar chegaralangan - to'lganda
+update qabul qilish sekinlashadi (backpressure) va bu metrikada ko'rinadi.
+"""
+
+import os
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, List
+
+import telebot
+from telebot import types
+
+from storage import db_pool
+
+DISPATCH_SHARDS = int(os.getenv('DISPATCH_SHARDS', '8'))
+DISPATCH_QUEUE_SIZE = int(os.getenv('DISPATCH_QUEUE_SIZE', '100'))
+
+_STOP = object()
+
+
+def update_shard_key(update: types.Update) -> int:
+    """Navbat kaliti: xabarlar chat, callbacklar foydalanuvchi bo'yicha; aniqlanmasa update_id.
+
+    Webhook navbatidagi ``storage.UPDATE_SHARD_KEY_SQL`` bilan bir xil bo'lishi kerak.
+    """
+    message = update.message or update.edited_message
+    if message:
+        return message.chat.id
+    if update.callback_query:
+        # Foydalanuvchi bo'yicha: kanal postidagi tugmalar bitta shardga yig'ilmaydi,
+        # holat ham foydalanuvchiga bog'liq, shuning uchun tartib saqlanadi
+        return update.callback_query.from_user.id
+    member_update = update.chat_member or update.my_chat_member
+    if member_update:
+        return member_update.chat.id
+    return update.update_id
+
+
+class ChatShardedPool:
+    """Kalit bo'yicha N ta chegaralangan navbat va har biriga bitta worker thread."""
+
+    def __init__(self, num_shards: int = DISPATCH_SHARDS, queue_size: int = DISPATCH_QUEUE_SIZE):
+        self.num_shards = num_shards
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in range(num_shards)]
+        self._processed = [0] * num_shards
+        self._max_depth = [0] * num_shards
+        self._blocked_puts = 0
+        self._blocked_seconds = 0.0
+        self._lock = threading.Lock()
+        self._workers = [
+            threading.Thread(target=self._work, args=(shard,), name=f'dispatch-{shard}', daemon=True)
+            for shard in range(num_shards)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def put(self, key: int, func: Callable, *args, **kwargs):
+        shard = hash(key) % self.num_shards
+        tasks = self._queues[shard]
+        task = (func, args, kwargs)
+        try:
+            tasks.put_nowait(task)
+        except queue.Full:
+            started = time.monotonic()
+            tasks.put(task)
+            with self._lock:
+                self._blocked_puts += 1
+                self._blocked_seconds += time.monotonic() - started
+        depth = tasks.qsize()
+        if depth > self._max_depth[shard]:
+            self._max_depth[shard] = depth
+
+    def _work(self, shard: int):
+        tasks = self._queues[shard]
+        while True:
+            task = tasks.get()
+            if task is _STOP:
+                return
+            func, args, kwargs = task
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                logging.exception(f"Update qayta ishlashda xatolik (shard {shard}): {e}")
+            finally:
+                self._processed[shard] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'shards': self.num_shards,
+                'depth': [tasks.qsize() for tasks in self._queues],
+                'max_depth': list(self._max_depth),
+                'processed': sum(self._processed),
+                'blocked_puts': self._blocked_puts,
+                'blocked_seconds': round(self._blocked_seconds, 3),
+            }
+
+    def close(self):
+        for tasks in self._queues:
+            tasks.put(_STOP)
+        for worker in self._workers:
+            if worker is not threading.current_thread():
+                worker.join()
+
+
+class ShardedTeleBot(telebot.TeleBot):
+    """Updatelarni ``ChatShardedPool`` orqali qayta ishlaydigan TeleBot (polling va webhook uchun)."""
+
+    def __init__(self, token: str, num_shards: int = DISPATCH_SHARDS, queue_size: int = DISPATCH_QUEUE_SIZE,
+                 **kwargs):
+        # Handlerlar shard threadida ketma-ket ishlaydi, shuning uchun TeleBot o'z pool'isiz
+        kwargs['threaded'] = False
+        super().__init__(token, **kwargs)
+        # Har bir shard threadi bitta pool ulanishini doimiy ushlaydi
+        db_pool.reserve(num_shards)
+        self.dispatcher = ChatShardedPool(num_shards, queue_size)
+
+    def process_new_updates(self, updates: List[types.Update]):
+        for update in updates:
+            # getUpdates offseti shu yerda suriladi: update navbatga tushdi
+            if update.update_id > self.last_update_id:
+                self.last_update_id = update.update_id
+            self.dispatcher.put(update_shard_key(update), super().process_new_updates, [update])
@@ -0,0 +1,107 @@
+"""
+Statik klaviaturalar: bir marta quriladi va JSON ga bir marta aylantiriladi.
+
+telebot ``reply_markup`` ni yuborishdan oldin ``to_json()`` orqali
+serializatsiya qiladi; ``PrebuiltMarkup`` tayyor JSON satrini qaytaradi,
+shuning uchun har bir xabarda tugmalar qayta yaratilmaydi.
+"""
+
+from telebot.types import (InlineKeyboardButton, InlineKeyboardMarkup, JsonSerializable, KeyboardButton,
+                           ReplyKeyboardMarkup)
+
+from callbacks import encode_callback
+
+
+class PrebuiltMarkup(JsonSerializable):
+    def __init__(self, markup):
+        self.markup = markup
+        self._json = markup.to_json()
+
+    def to_json(self):
+        return self._json
+
+
+# ===== REPLY KLAVIATURALAR =====
+BACK_MENU = PrebuiltMarkup(ReplyKeyboardMarkup(resize_keyboard=True).add(KeyboardButton('🔙 Orqaga')))
+
+_MAIN_MENU_BUTTONS = ('🌐 Startuplar', '📌 Mening startuplarim', '➕ Startup yaratish', '👤 Profil')
+
+MAIN_MENU = PrebuiltMarkup(
+    ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
+    .add(*(KeyboardButton(text) for text in _MAIN_MENU_BUTTONS))
+)
+ADMIN_MAIN_MENU = PrebuiltMarkup(
+    ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
+    .add(*(KeyboardButton(text) for text in _MAIN_MENU_BUTTONS))
+    .add(KeyboardButton('🛠 Admin panel'))
+)
+ADMIN_PANEL_MENU = PrebuiltMarkup(
+    ReplyKeyboardMarkup(resize_keyboard=True, row_width=2).add(
+        KeyboardButton('📊 Dashboard'),
+        KeyboardButton('🚀 Startuplar'),
+        KeyboardButton('👥 Foydalanuvchilar'),
+        KeyboardButton('📢 Xabar yuborish'),
+        KeyboardButton('⚙️ Sozlamalar'),
+        KeyboardButton('🔙 Orqaga')
+    )
+)
+
+# ===== INLINE KLAVIATURALAR =====
+PROFILE_KEYBOARD = PrebuiltMarkup(
+    InlineKeyboardMarkup(row_width=2).add(
+        InlineKeyboardButton('✏️ Ism', callback_data=encode_callback('edit_profile', 'first_name')),
+        InlineKeyboardButton('✏️ Familiya', callback_data=encode_callback('edit_profile', 'last_name')),
+        InlineKeyboardButton('📞 Telefon', callback_data=encode_callback('edit_profile', 'phone')),
+        InlineKeyboardButton('⚧️ Jins', callback_data=encode_callback('edit_profile', 'gender')),
+        InlineKeyboardButton('🎂 Tug\'ilgan sana', callback_data=encode_callback('edit_profile', 'birth_date')),
+        InlineKeyboardButton('📝 Bio', callback_data=encode_callback('edit_profile', 'bio'))
+    )
+    # Add inline back button to avoid sending an extra message with reply keyboard
+    .add(InlineKeyboardButton('🔙 Orqaga', callback_data='back_to_main_menu'))
+)
+GENDER_KEYBOARD = PrebuiltMarkup(
+    InlineKeyboardMarkup(row_width=2).add(
+        InlineKeyboardButton('👨 Erkak', callback_data=encode_callback('gender', 'male')),
+        InlineKeyboardButton('👩 Ayol', callback_data=encode_callback('gender', 'female')),
+        InlineKeyboardButton('🔙 Orqaga', callback_data='back_to_profile')
+    )
+)
+DASHBOARD_KEYBOARD = PrebuiltMarkup(
+    InlineKeyboardMarkup().add(
+        InlineKeyboardButton('🔄 Yangilash', callback_data='refresh_dashboard'),
+        InlineKeyboardButton('📈 Toliq statistikalar', callback_data='full_stats'),
+        InlineKeyboardButton('🔙 Orqaga', callback_data='back_to_admin_panel')
+    )
+)
+ADMIN_STARTUPS_KEYBOARD = PrebuiltMarkup(
+    InlineKeyboardMarkup(row_width=2).add(
+        InlineKeyboardButton('⏳ Kutilayotgan', callback_data=encode_callback('pending_startups', 1)),
+        InlineKeyboardButton('▶️ Faol', callback_data=encode_callback('active_startups', 1)),
+        InlineKeyboardButton('✅ Yakunlangan', callback_data=encode_callback('completed_startups', 1)),
+        InlineKeyboardButton('❌ Rad etilgan', callback_data=encode_callback('rejected_startups', 1)),
+        InlineKeyboardButton('🔙 Orqaga', callback_data='back_to_admin_panel')
+    )
+)
+ADMIN_USERS_KEYBOARD = PrebuiltMarkup(
+    InlineKeyboardMarkup().add(
+        InlineKeyboardButton('📥 Foydalanuvchilar ro\'yxati', callback_data=encode_callback('users_list', 1)),
+        InlineKeyboardButton('📊 Statistika', callback_data='users_stats'),
+        InlineKeyboardButton('🔙 Orqaga', callback_data='back_to_admin_panel')
+    )
+)
+ADMIN_SETTINGS_KEYBOARD = PrebuiltMarkup(
+    InlineKeyboardMarkup().add(
+        InlineKeyboardButton('🔄 Database yangilash', callback_data='refresh_db'),
+        InlineKeyboardButton('📊 Backup olish', callback_data='backup_db'),
+        InlineKeyboardButton('🔙 Orqaga', callback_data='back_to_admin_panel')
+    )
+)
+
+
+def subscription_keyboard(channel_username: str) -> PrebuiltMarkup:
+    return PrebuiltMarkup(
+        InlineKeyboardMarkup().row(
+            InlineKeyboardButton('🔗 Kanalga o\'tish', url=f'https://t.me/{channel_username[1:]}'),
+            InlineKeyboardButton('✅ Tekshirish', callback_data='check_subscription')
+        )
+    )
@@ -1,360 +1,467 @@
 # main.py
 import os
+import sys
+import time
+import calendar
 import logging
-import sqlite3
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 import telebot
 from telebot import types
-from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
+from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardRemove
+
+# storage.py repo ildizida (bot/ va web/ uchun bitta modul)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import storage
+import broadcast
+import state_store
+import dispatch
+import keyboards
+from callbacks import CallbackRouter, encode_callback
+from storage import DB_PATH, db_pool, TTLCache
 
 # Bot tokenini environmentdan olish yoki to'g'ridan-to'g'ri yozish
 BOT_TOKEN = os.getenv('BOT_TOKEN', '8545746982:AAH8Dv_JiGplNx_Ut2hN_lWLPFWOz6DxBGo')
 CHANNEL_USERNAME = '@GarajHub_uz'  # Kanal username
 ADMIN_ID = 7903688837  # Admin ID
+ADMIN_IDS = frozenset({ADMIN_ID})  # admin tugmalari shu to'plam bo'yicha tekshiriladi
 
-bot = telebot.TeleBot(BOT_TOKEN, parse_mode='HTML')
+# Updatelar chat bo'yicha shardlanadi: bitta chat ketma-ket, turli chatlar parallel
+bot = dispatch.ShardedTeleBot(BOT_TOKEN, parse_mode='HTML')
+broadcaster = broadcast.BroadcastRunner(bot)
+# Barcha inline tugmalar shu jadval orqali (bitta catch-all callback handler)
+callback_router = CallbackRouter()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '5000'))
+STARTUP_CACHE_SIZE = int(os.getenv('STARTUP_CACHE_SIZE', '2000'))
+RECORD_CACHE_TTL = float(os.getenv('RECORD_CACHE_TTL', '10'))
+
+# get_user / get_startup uchun read-through kesh; yozuvchi funksiyalar kalitni o'chiradi.
+# Kesh jarayon ichida: web admin yoki boshqa bot jarayoni yozgan o'zgarish shu yerda
+# RECORD_CACHE_TTL gacha eski ko'rinishi mumkin, shuning uchun TTL qisqa
+user_cache = TTLCache(USER_CACHE_SIZE, RECORD_CACHE_TTL)
+startup_cache = TTLCache(STARTUP_CACHE_SIZE, RECORD_CACHE_TTL)
+
+CAROUSEL_SNAPSHOT_TTL = float(os.getenv('CAROUSEL_SNAPSHOT_TTL', '60'))
+CAROUSEL_PREFETCH = int(os.getenv('CAROUSEL_PREFETCH', '5'))
+
+# Karusel: "🌐 Startuplar" ochilganda faol startup id lari tartibi foydalanuvchi uchun saqlanadi,
+# keyingi kartalar (muallif bilan) bitta IN so'rov bilan oldindan yuklanadi.
+# Web admin rad etgan/o'chirgan startup boshqa jarayon keshida CAROUSEL_SNAPSHOT_TTL gacha qoladi
+carousel_snapshots = TTLCache(USER_CACHE_SIZE, CAROUSEL_SNAPSHOT_TTL)
+carousel_cards = TTLCache(STARTUP_CACHE_SIZE, CAROUSEL_SNAPSHOT_TTL)
+
+SUBSCRIPTION_CACHE_SIZE = int(os.getenv('SUBSCRIPTION_CACHE_SIZE', '20000'))
+SUBSCRIBED_TTL = float(os.getenv('SUBSCRIBED_TTL', '300'))
+NOT_SUBSCRIBED_TTL = float(os.getenv('NOT_SUBSCRIBED_TTL', '30'))
+SUBSCRIBED_STATUSES = ('member', 'administrator', 'creator')
+
+# Kanal obunasi holati: obuna bo'lganlar bir necha daqiqa, obuna bo'lmaganlar qisqa saqlanadi;
+# chat_member yangilanishlari faqat ularni qabul qilgan jarayon keshini yangilaydi, shuning uchun
+# kanaldan chiqqan foydalanuvchi boshqa jarayonlarda ko'pi bilan SUBSCRIBED_TTL davomida obunachi ko'rinadi
+subscription_cache = TTLCache(SUBSCRIPTION_CACHE_SIZE, SUBSCRIBED_TTL)
+
+# Suhbat holati (joriy qadam + wizard ma'lumotlari); STATE_BACKEND bilan tanlanadi
+user_state_store = state_store.create_state_store()
+
 # Database yaratish
 def init_db():
-    conn = sqlite3.connect('garajhub.db', check_same_thread=False)
-    cursor = conn.cursor()
-    
-    # Foydalanuvchilar jadvali
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            user_id INTEGER PRIMARY KEY,
-            username TEXT,
-            first_name TEXT,
-            last_name TEXT DEFAULT '',
-            phone TEXT DEFAULT '',
-            gender TEXT DEFAULT '',
-            birth_date TEXT DEFAULT '',
-            bio TEXT DEFAULT '',
-            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Migrate: Add missing columns if they don't exist
-    try:
-        cursor.execute('PRAGMA table_info(users)')
-        columns = [col[1] for col in cursor.fetchall()]
-        
-        if 'last_name' not in columns:
-            cursor.execute('ALTER TABLE users ADD COLUMN last_name TEXT DEFAULT ""')
-        if 'phone' not in columns:
-            cursor.execute('ALTER TABLE users ADD COLUMN phone TEXT DEFAULT ""')
-        if 'gender' not in columns:
-            cursor.execute('ALTER TABLE users ADD COLUMN gender TEXT DEFAULT ""')
-        if 'birth_date' not in columns:
-            cursor.execute('ALTER TABLE users ADD COLUMN birth_date TEXT DEFAULT ""')
-        if 'bio' not in columns:
-            cursor.execute('ALTER TABLE users ADD COLUMN bio TEXT DEFAULT ""')
-    except Exception as e:
-        logging.warning(f"Migration warning (non-critical): {e}")
-    
-    # Startuplar jadvali
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS startups (
-            startup_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            description TEXT,
-            logo TEXT,
-            group_link TEXT NOT NULL,
-            owner_id INTEGER NOT NULL,
-            status TEXT DEFAULT 'pending', -- pending, active, completed, rejected
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            started_at TIMESTAMP,
-            ended_at TIMESTAMP,
-            results TEXT,
-            FOREIGN KEY (owner_id) REFERENCES users (user_id)
-        )
-    ''')
-    
-    # Migrate: Add missing columns to startups table
-    try:
-        cursor.execute('PRAGMA table_info(startups)')
-        columns = [col[1] for col in cursor.fetchall()]
-        
-        if 'logo' not in columns:
-            cursor.execute('ALTER TABLE startups ADD COLUMN logo TEXT')
-        if 'group_link' not in columns:
-            cursor.execute('ALTER TABLE startups ADD COLUMN group_link TEXT')
-        if 'started_at' not in columns:
-            cursor.execute('ALTER TABLE startups ADD COLUMN started_at TIMESTAMP')
-        if 'ended_at' not in columns:
-            cursor.execute('ALTER TABLE startups ADD COLUMN ended_at TIMESTAMP')
-        if 'results' not in columns:
-            cursor.execute('ALTER TABLE startups ADD COLUMN results TEXT')
-    except Exception as e:
-        logging.warning(f"Migration warning for startups (non-critical): {e}")
-    
-    # Startup a'zolari jadvali
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS startup_members (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            startup_id INTEGER NOT NULL,
-            user_id INTEGER NOT NULL,
-            status TEXT DEFAULT 'pending', -- pending, accepted, rejected
-            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (startup_id) REFERENCES startups (startup_id),
-            FOREIGN KEY (user_id) REFERENCES users (user_id),
-            UNIQUE(startup_id, user_id)
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
-    logging.info("Database initialized")
+    storage.init_db()
+    if isinstance(user_state_store, state_store.SQLiteStateStore):
+        user_state_store.purge_expired()
 
 # Database funktsiyalari
 def get_user(user_id: int) -> Optional[Dict]:
-    conn = sqlite3.connect('garajhub.db', check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
-    user = cursor.fetchone()
-    conn.close()
-    return dict(user) if user else None
+    user = user_cache.get(user_id)
+    if user is not None:
+        return dict(user)
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
+        user = cursor.fetchone()
+    if not user:
+        return None
+    user_cache.set(user_id, dict(user))
+    return dict(user)
 
 def save_user(user_id: int, username: str, first_name: str):
-    conn = sqlite3.connect('garajhub.db', check_same_thread=False)
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT OR IGNORE INTO users (user_id, username, first_name) 
-        VALUES (?, ?, ?)
-    ''', (user_id, username, first_name))
-    conn.commit()
-    conn.close()
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR IGNORE INTO users (user_id, username, first_name) 
+            VALUES (?, ?, ?)
+        ''', (user_id, username, first_name))
+    user_cache.pop(user_id)
 
 def update_user_field(user_id: int, field: str, value: str):
-    conn = sqlite3.connect('garajhub.db', check_same_thread=False)
-    cursor = conn.cursor()
-    cursor.execute(f'UPDATE users SET {field} = ? WHERE user_id = ?', (value, user_id))
-    conn.commit()
-    conn.close()
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'UPDATE users SET {field} = ? WHERE user_id = ?', (value, user_id))
+    user_cache.pop(user_id)
 
 def create_startup(name: str, description: str, logo: str, group_link: str, owner_id: int) -> int:
-    conn = sqlite3.connect('garajhub.db', check_same_thread=False)
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO startups (name, description, logo, group_link, owner_id, status)
-        VALUES (?, ?, ?, ?, ?, 'pending')
-    ''', (name, description, logo, group_link, owner_id))
-    startup_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO startups (name, description, logo, group_link, owner_id, status)
+            VALUES (?, ?, ?, ?, ?, 'pending')
+        ''', (name, description, logo, group_link, owner_id))
+        startup_id = cursor.lastrowid
+    startup_cache.pop(startup_id)
     return startup_id
 
 def get_startup(startup_id: int) -> Optional[Dict]:
-    conn = sqlite3.connect('garajhub.db', check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM startups WHERE startup_id = ?', (startup_id,))
-    startup = cursor.fetchone()
-    conn.close()
+    startup = startup_cache.get(startup_id)
+    if startup is not None:
+        return dict(startup)
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM startups WHERE startup_id = ?', (startup_id,))
+        startup = cursor.fetchone()
+    if not startup:
+        return None
+    startup_cache.set(startup_id, dict(startup))
+    return dict(startup)
+
+# Ro'yxatlar egasi ma'lumotini JOIN bilan oladi (har bir startup uchun alohida get_user emas)
+OWNER_COLUMNS = 'u.username AS owner_username, u.first_name AS owner_first_name, u.last_name AS owner_last_name'
+
+def get_startup_with_owner(startup_id: int) -> Optional[Dict]:
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT s.*, {OWNER_COLUMNS} FROM startups s
+            LEFT JOIN users u ON u.user_id = s.owner_id
+            WHERE s.startup_id = ?
+        ''', (startup_id,))
+        startup = cursor.fetchone()
     return dict(startup) if startup else None
 
-def get_startups_by_owner(owner_id: int) -> List[Dict]:
-    conn = sqlite3.connect('garajhub.db', check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM startups WHERE owner_id = ? ORDER BY created_at DESC', (owner_id,))
-    startups = cursor.fetchall()
-    conn.close()
-    return [dict(s) for s in startups]
+def get_startups_with_owner(startup_ids: List[int]) -> Dict[int, Dict]:
+    if not startup_ids:
+        return {}
+    placeholders = ','.join('?' * len(startup_ids))
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT s.*, {OWNER_COLUMNS} FROM startups s
+            LEFT JOIN users u ON u.user_id = s.owner_id
+            WHERE s.startup_id IN ({placeholders})
+        ''', startup_ids)
+        return {row['startup_id']: dict(row) for row in cursor.fetchall()}
+
+def format_owner_name(startup: Dict) -> str:
+    owner_name = f"{startup.get('owner_first_name') or ''} {startup.get('owner_last_name') or ''}".strip()
+    return owner_name or "Noma'lum"
+
+def get_users_by_ids(user_ids: List[int]) -> Dict[int, Dict]:
+    """Ko'p foydalanuvchini bitta IN (...) so'rovi bilan oladi: {user_id: user}."""
+    unique_ids = list(dict.fromkeys(user_ids))
+    users = {}
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        for i in range(0, len(unique_ids), 500):
+            chunk = unique_ids[i:i + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            cursor.execute(f'SELECT * FROM users WHERE user_id IN ({placeholders})', chunk)
+            users.update({row['user_id']: dict(row) for row in cursor.fetchall()})
+    return users
+
+def attach_owners(startups: List[Dict]) -> List[Dict]:
+    """JOIN qilinmagan startup ro'yxatiga owner_* maydonlarini bitta so'rov bilan qo'shadi."""
+    owners = get_users_by_ids([s['owner_id'] for s in startups])
+    for startup in startups:
+        owner = owners.get(startup['owner_id'], {})
+        startup['owner_username'] = owner.get('username')
+        startup['owner_first_name'] = owner.get('first_name')
+        startup['owner_last_name'] = owner.get('last_name')
+    return startups
+
+def get_startups_by_owner_page(owner_id: int, page: int = 1, per_page: int = 5) -> Tuple[List[Dict], int, int]:
+    """Faqat sahifadagi (startup_id, name, status) qatorlari, jami soni va to'g'rilangan sahifa."""
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM startups WHERE owner_id = ?', (owner_id,))
+        total = cursor.fetchone()[0]
+        total_pages = max(1, (total + per_page - 1) // per_page)
+        page = min(max(1, page), total_pages)
+        cursor.execute('''
+            SELECT startup_id, name, status FROM startups
+            WHERE owner_id = ?
+            ORDER BY created_at DESC, startup_id DESC
+            LIMIT ? OFFSET ?
+        ''', (owner_id, per_page, (page - 1) * per_page))
+        startups = cursor.fetchall()
+    return [dict(s) for s in startups], total, page
+
+# Keyset pagination: kursor = "<created_at epoch>-<startup_id>", callback_data ichida yuriladi
+def encode_cursor(startup: Dict) -> str:
+    created_at = calendar.timegm(time.strptime(startup['created_at'], '%Y-%m-%d %H:%M:%S'))
+    return f"{created_at}-{startup['startup_id']}"
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    created_at, startup_id = cursor.split('-')
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(int(created_at))), int(startup_id)
+
+# Foydalanuvchilar ro'yxati uchun xuddi shunday: "<joined_at epoch>-<user_id>"
+def encode_user_cursor(user: Dict) -> str:
+    joined_at = calendar.timegm(time.strptime(user['joined_at'], '%Y-%m-%d %H:%M:%S'))
+    return f"{joined_at}-{user['user_id']}"
+
+def get_startups_page(status: str, cursor: Optional[str] = None, per_page: int = 5,
+                      backward: bool = False) -> Tuple[List[Dict], bool]:
+    """(startuplar, shu yo'nalishda yana sahifa bormi) qaytaradi.
+
+    Kursor bo'lmasa eng yangi sahifa; backward=True kursordan oldingi (yangiroq) sahifa.
+    OFFSET ishlatilmaydi, shuning uchun har qanday sahifa (status, created_at) indeksida
+    bitta seek bilan o'qiladi.
+    """
+    query = f'SELECT s.*, {OWNER_COLUMNS} FROM startups s LEFT JOIN users u ON u.user_id = s.owner_id WHERE s.status = ?'
+    params: list = [status]
+    if cursor:
+        query += ' AND (s.created_at, s.startup_id) > (?, ?)' if backward else ' AND (s.created_at, s.startup_id) < (?, ?)'
+        params.extend(decode_cursor(cursor))
+    query += ' ORDER BY s.created_at ASC, s.startup_id ASC' if backward else ' ORDER BY s.created_at DESC, s.startup_id DESC'
+    query += ' LIMIT ?'
+    params.append(per_page + 1)
+    
+    with db_pool.connection() as conn:
+        startups = [dict(s) for s in conn.execute(query, params).fetchall()]
+    
+    has_more = len(startups) > per_page
+    startups = startups[:per_page]
+    if backward:
+        startups.reverse()
+    return startups, has_more
+
+def keyset_page(page: int, direction: str = 'n', cursor: Optional[str] = None) -> Tuple[int, Optional[str], bool]:
+    """Sahifa callback argumentlari (page, n|p, cursor) -> (page, cursor, backward)."""
+    if cursor is None:
+        # Kursorsiz (birinchi yoki eski) tugma: boshidan
+        return 1, None, False
+    return page, cursor, direction == 'p'
+
+def keyset_nav_buttons(action: str, page: int, startups: List[Dict], has_more: bool, backward: bool,
+                       prev_label: str = '⏮️ Oldingi', next_label: str = '⏭️ Keyingi',
+                       cursor_of: Callable[[Dict], str] = encode_cursor) -> List[InlineKeyboardButton]:
+    buttons = []
+    if page > 1:
+        prev_data = encode_callback(action, 1) if page == 2 else encode_callback(action, page - 1, 'p', cursor_of(startups[0]))
+        buttons.append(InlineKeyboardButton(prev_label, callback_data=prev_data))
+    if has_more or backward:
+        buttons.append(InlineKeyboardButton(next_label, callback_data=encode_callback(action, page + 1, 'n', cursor_of(startups[-1]))))
+    return buttons
+
+def count_startups(status: str) -> int:
+    return get_statistics()[f'{status}_startups']
+
+def get_pending_startups(cursor: Optional[str] = None, per_page: int = 5, backward: bool = False) -> Tuple[List[Dict], bool]:
+    return get_startups_page('pending', cursor, per_page, backward)
 
-def get_pending_startups(page: int = 1, per_page: int = 5) -> Tuple[List[Dict], int]:
-    conn = sqlite3.connect('garajhub.db', check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    offset = (page - 1) * per_page
-    cursor.execute('SELECT * FROM startups WHERE status = "pending" ORDER BY created_at DESC LIMIT ? OFFSET ?', (per_page, offset))
-    startups = cursor.fetchall()
-    cursor.execute('SELECT COUNT(*) as count FROM startups WHERE status = "pending"')
-    total = cursor.fetchone()['count']
-    conn.close()
-    return [dict(s) for s in startups], total
-
-def get_active_startups(page: int = 1, per_page: int = 10) -> Tuple[List[Dict], int]:
-    conn = sqlite3.connect('garajhub.db', check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    offset = (page - 1) * per_page
-    cursor.execute('SELECT * FROM startups WHERE status = "active" ORDER BY created_at DESC LIMIT ? OFFSET ?', (per_page, offset))
-    startups = cursor.fetchall()
-    cursor.execute('SELECT COUNT(*) as count FROM startups WHERE status = "active"')
-    total = cursor.fetchone()['count']
-    conn.close()
-    return [dict(s) for s in startups], total
+def get_active_startups(cursor: Optional[str] = None, per_page: int = 10, backward: bool = False) -> Tuple[List[Dict], bool]:
+    return get_startups_page('active', cursor, per_page, backward)
+
+def get_completed_startups(cursor: Optional[str] = None, per_page: int = 5, backward: bool = False) -> Tuple[List[Dict], bool]:
+    return get_startups_page('completed', cursor, per_page, backward)
+
+def get_rejected_startups(cursor: Optional[str] = None, per_page: int = 5, backward: bool = False) -> Tuple[List[Dict], bool]:
+    return get_startups_page('rejected', cursor, per_page, backward)
+
+def get_active_startup_ids() -> List[int]:
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT startup_id FROM startups WHERE status = 'active'
+            ORDER BY created_at DESC, startup_id DESC
+        ''')
+        return [row['startup_id'] for row in cursor.fetchall()]
+
+def take_carousel_snapshot(user_id: int) -> List[int]:
+    startup_ids = get_active_startup_ids()
+    carousel_snapshots.set(user_id, startup_ids)
+    return startup_ids
+
+def get_carousel_card(user_id: int, index: int) -> Tuple[Optional[Dict], int, int]:
+    """Snapshotdagi ``index``-karta: (startup, index, jami); snapshot muddati o'tsa qayta olinadi."""
+    startup_ids = carousel_snapshots.get(user_id)
+    if startup_ids is None:
+        startup_ids = take_carousel_snapshot(user_id)
+    for _ in range(2):
+        if not startup_ids:
+            return None, 0, 0
+        index = min(max(index, 0), len(startup_ids) - 1)
+        window = startup_ids[index:index + CAROUSEL_PREFETCH]
+        missing = [startup_id for startup_id in window if carousel_cards.get(startup_id) is None]
+        for startup_id, startup in get_startups_with_owner(missing).items():
+            if startup['status'] == 'active':
+                carousel_cards.set(startup_id, startup)
+        startup = carousel_cards.get(startup_ids[index])
+        if startup is not None:
+            return startup, index, len(startup_ids)
+        # Snapshotdan keyin o'chirilgan yoki faol emas: ro'yxatni yangilaymiz
+        startup_ids = take_carousel_snapshot(user_id)
+    return None, 0, 0
 
 def update_startup_status(startup_id: int, status: str):
-    conn = sqlite3.connect('garajhub.db', check_same_thread=False)
-    cursor = conn.cursor()
-    if status == 'active':
-        cursor.execute('UPDATE startups SET status = ?, started_at = CURRENT_TIMESTAMP WHERE startup_id = ?', (status, startup_id))
-    elif status == 'completed':
-        cursor.execute('UPDATE startups SET status = ?, ended_at = CURRENT_TIMESTAMP WHERE startup_id = ?', (status, startup_id))
-    else:
-        cursor.execute('UPDATE startups SET status = ? WHERE startup_id = ?', (status, startup_id))
-    conn.commit()
-    conn.close()
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        if status == 'active':
+            cursor.execute('UPDATE startups SET status = ?, started_at = CURRENT_TIMESTAMP WHERE startup_id = ?', (status, startup_id))
+        elif status == 'completed':
+            cursor.execute('UPDATE startups SET status = ?, ended_at = CURRENT_TIMESTAMP WHERE startup_id = ?', (status, startup_id))
+        else:
+            cursor.execute('UPDATE startups SET status = ? WHERE startup_id = ?', (status, startup_id))
+    startup_cache.pop(startup_id)
+    carousel_cards.pop(startup_id)
 
 def get_startup_members(startup_id: int, page: int = 1, per_page: int = 5) -> Tuple[List[Dict], int]:
-    conn = sqlite3.connect('garajhub.db', check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    offset = (page - 1) * per_page
-    cursor.execute('''
-        SELECT u.* FROM users u
-        JOIN startup_members sm ON u.user_id = sm.user_id
-        WHERE sm.startup_id = ? AND sm.status = 'accepted'
-        LIMIT ? OFFSET ?
-    ''', (startup_id, per_page, offset))
-    members = cursor.fetchall()
-    cursor.execute('SELECT COUNT(*) as count FROM startup_members WHERE startup_id = ? AND status = "accepted"', (startup_id,))
-    total = cursor.fetchone()['count']
-    conn.close()
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        offset = (page - 1) * per_page
+        cursor.execute('''
+            SELECT u.* FROM users u
+            JOIN startup_members sm ON u.user_id = sm.user_id
+            WHERE sm.startup_id = ? AND sm.status = 'accepted'
+            LIMIT ? OFFSET ?
+        ''', (startup_id, per_page, offset))
+        members = cursor.fetchall()
+        cursor.execute('SELECT COUNT(*) as count FROM startup_members WHERE startup_id = ? AND status = "accepted"', (startup_id,))
+        total = cursor.fetchone()['count']
     return [dict(m) for m in members], total
 
+def count_startup_members(startup_id: int) -> int:
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM startup_members WHERE startup_id = ? AND status = "accepted"', (startup_id,))
+        return cursor.fetchone()[0]
+
+def complete_startup_record(startup_id: int, results: str) -> List[int]:
+    """Startupni yakunlaydi va qabul qilingan a'zolar ID larini qaytaradi."""
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('UPDATE startups SET status = "completed", results = ?, ended_at = CURRENT_TIMESTAMP WHERE startup_id = ?', 
+                      (results, startup_id))
+        cursor.execute('SELECT user_id FROM startup_members WHERE startup_id = ? AND status = "accepted"', (startup_id,))
+        members = cursor.fetchall()
+    startup_cache.pop(startup_id)
+    carousel_cards.pop(startup_id)
+    return [m['user_id'] for m in members]
+
 def add_startup_member(startup_id: int, user_id: int):
-    conn = sqlite3.connect('garajhub.db', check_same_thread=False)
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT OR REPLACE INTO startup_members (startup_id, user_id, status)
-        VALUES (?, ?, 'pending')
-    ''', (startup_id, user_id))
-    conn.commit()
-    conn.close()
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO startup_members (startup_id, user_id, status)
+            VALUES (?, ?, 'pending')
+        ''', (startup_id, user_id))
 
 def get_join_request_id(startup_id: int, user_id: int):
-    conn = sqlite3.connect('garajhub.db', check_same_thread=False)
-    cursor = conn.cursor()
-    cursor.execute('SELECT id FROM startup_members WHERE startup_id = ? AND user_id = ?', (startup_id, user_id))
-    result = cursor.fetchone()
-    conn.close()
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT id FROM startup_members WHERE startup_id = ? AND user_id = ?', (startup_id, user_id))
+        result = cursor.fetchone()
     return result[0] if result else None
 
+def get_join_request(request_id: int) -> Optional[Dict]:
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT startup_id, user_id FROM startup_members WHERE id = ?', (request_id,))
+        result = cursor.fetchone()
+    return dict(result) if result else None
+
 def update_join_request(request_id: int, status: str):
-    conn = sqlite3.connect('garajhub.db', check_same_thread=False)
-    cursor = conn.cursor()
-    cursor.execute('UPDATE startup_members SET status = ? WHERE id = ?', (status, request_id))
-    conn.commit()
-    conn.close()
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('UPDATE startup_members SET status = ? WHERE id = ?', (status, request_id))
 
 def get_statistics() -> Dict:
-    conn = sqlite3.connect('garajhub.db', check_same_thread=False)
-    cursor = conn.cursor()
-    cursor.execute('SELECT COUNT(*) FROM users')
-    total_users = cursor.fetchone()[0]
-    cursor.execute('SELECT COUNT(*) FROM startups')
-    total_startups = cursor.fetchone()[0]
-    cursor.execute('SELECT COUNT(*) FROM startups WHERE status = "active"')
-    active_startups = cursor.fetchone()[0]
-    cursor.execute('SELECT COUNT(*) FROM startups WHERE status = "pending"')
-    pending_startups = cursor.fetchone()[0]
-    cursor.execute('SELECT COUNT(*) FROM startups WHERE status = "completed"')
-    completed_startups = cursor.fetchone()[0]
-    cursor.execute('SELECT COUNT(*) FROM startups WHERE status = "rejected"')
-    rejected_startups = cursor.fetchone()[0]
-    conn.close()
-    return {
-        'total_users': total_users,
-        'total_startups': total_startups,
-        'active_startups': active_startups,
-        'pending_startups': pending_startups,
-        'completed_startups': completed_startups,
-        'rejected_startups': rejected_startups
-    }
+    return storage.get_statistics()
 
 def get_all_users():
-    conn = sqlite3.connect('garajhub.db', check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute('SELECT user_id FROM users')
-    users = cursor.fetchall()
-    conn.close()
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT user_id FROM users')
+        users = cursor.fetchall()
     return [u['user_id'] for u in users]
 
 def get_recent_users(limit: int = 10):
-    conn = sqlite3.connect('garajhub.db', check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users ORDER BY joined_at DESC LIMIT ?', (limit,))
-    users = cursor.fetchall()
-    conn.close()
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM users ORDER BY joined_at DESC LIMIT ?', (limit,))
+        users = cursor.fetchall()
     return [dict(u) for u in users]
 
 def get_recent_startups(limit: int = 10):
-    conn = sqlite3.connect('garajhub.db', check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM startups ORDER BY created_at DESC LIMIT ?', (limit,))
-    startups = cursor.fetchall()
-    conn.close()
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM startups ORDER BY created_at DESC LIMIT ?', (limit,))
+        startups = cursor.fetchall()
     return [dict(s) for s in startups]
 
-def get_completed_startups(page: int = 1, per_page: int = 5):
-    conn = sqlite3.connect('garajhub.db', check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    offset = (page - 1) * per_page
-    cursor.execute('SELECT * FROM startups WHERE status = "completed" ORDER BY created_at DESC LIMIT ? OFFSET ?', (per_page, offset))
-    startups = cursor.fetchall()
-    cursor.execute('SELECT COUNT(*) as count FROM startups WHERE status = "completed"')
-    total = cursor.fetchone()['count']
-    conn.close()
-    return [dict(s) for s in startups], total
-
-def get_rejected_startups(page: int = 1, per_page: int = 5):
-    conn = sqlite3.connect('garajhub.db', check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    offset = (page - 1) * per_page
-    cursor.execute('SELECT * FROM startups WHERE status = "rejected" ORDER BY created_at DESC LIMIT ? OFFSET ?', (per_page, offset))
-    startups = cursor.fetchall()
-    cursor.execute('SELECT COUNT(*) as count FROM startups WHERE status = "rejected"')
-    total = cursor.fetchone()['count']
-    conn.close()
-    return [dict(s) for s in startups], total
-
 # User state management
-user_states = {}
-
-def set_user_state(user_id: int, state: str):
-    user_states[user_id] = state
+def set_user_state(user_id: int, state: str, data: Optional[Dict] = None):
+    user_state_store.set(user_id, state, data)
 
 def get_user_state(user_id: int) -> str:
-    return user_states.get(user_id, '')
+    return user_state_store.get(user_id)[0]
+
+def get_user_state_data(user_id: int) -> Tuple[str, Dict]:
+    return user_state_store.get(user_id)
 
 def clear_user_state(user_id: int):
-    if user_id in user_states:
-        del user_states[user_id]
+    user_state_store.clear(user_id)
+
+# Reply-keyboard tugmalari: matn -> handler (admin tugmalari alohida jadvalda)
+TEXT_COMMANDS: Dict[str, Callable] = {}
+ADMIN_TEXT_COMMANDS: Dict[str, Callable] = {}
+
+def text_command(text: str, admin_only: bool = False):
+    def decorator(func):
+        (ADMIN_TEXT_COMMANDS if admin_only else TEXT_COMMANDS)[text] = func
+        return func
+    return decorator
+
+# Keyingi xabarni kutayotgan qadamlar: holat nomi -> handler(message, data)
+STEP_HANDLERS: Dict[str, Callable] = {}
+
+def conversation_step(state: str):
+    def decorator(func):
+        STEP_HANDLERS[state] = func
+        return func
+    return decorator
 
 # Orqaga tugmasini yaratish
+# Statik klaviaturalar keyboards.py da bir marta quriladi; bu yerda faqat tanlanadi
 def create_back_button():
-    markup = ReplyKeyboardMarkup(resize_keyboard=True)
-    markup.add(KeyboardButton('🔙 Orqaga'))
-    return markup
+    return keyboards.BACK_MENU
 
 # Asosiy menyu tugmalari
 def create_main_menu(user_id: int):
-    markup = ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
-    buttons = [
-        KeyboardButton('🌐 Startuplar'),
-        KeyboardButton('📌 Mening startuplarim'),
-        KeyboardButton('➕ Startup yaratish'),
-        KeyboardButton('👤 Profil')
-    ]
-    markup.add(*buttons)
-    
-    if user_id == ADMIN_ID:
-        markup.add(KeyboardButton('🛠 Admin panel'))
-    
-    return markup
+    return keyboards.ADMIN_MAIN_MENU if user_id in ADMIN_IDS else keyboards.MAIN_MENU
 
 # 1. START - KANALGA OBUNA TEKSHIRISH
+def set_subscription_status(user_id: int, status: str) -> bool:
+    subscribed = status in SUBSCRIBED_STATUSES
+    subscription_cache.set(user_id, subscribed, None if subscribed else NOT_SUBSCRIBED_TTL)
+    return subscribed
+
+def is_subscribed(user_id: int, trust_negative: bool = True) -> bool:
+    """Kanalga obunani tekshiradi; keshda bo'lsa Telegramga so'rov yuborilmaydi."""
+    subscribed = subscription_cache.get(user_id)
+    if subscribed or (subscribed is not None and trust_negative):
+        return subscribed
+    chat_member = bot.get_chat_member(CHANNEL_USERNAME, user_id)
+    return set_subscription_status(user_id, chat_member.status)
+
+@bot.chat_member_handler(func=lambda update: (update.chat.username or '').lower() == CHANNEL_USERNAME[1:].lower())
+def handle_channel_member_update(update):
+    # Bot kanalda admin bo'lsa, obuna/chiqish kesh muddatini kutmasdan hisobga olinadi
+    set_subscription_status(update.new_chat_member.user.id, update.new_chat_member.status)
+
 @bot.message_handler(commands=['start', 'help'])
 def start_command(message):
     user_id = message.from_user.id
@@ -365,8 +472,7 @@ def start_command(message):
     
     # Kanalga obuna tekshirish
     try:
-        chat_member = bot.get_chat_member(CHANNEL_USERNAME, user_id)
-        if chat_member.status in ['member', 'administrator', 'creator']:
+        if is_subscribed(user_id):
             show_main_menu(message)
         else:
             ask_for_subscription(message)
@@ -374,25 +480,22 @@ def start_command(message):
         logging.error(f"Obuna tekshirishda xatolik: {e}")
         ask_for_subscription(message)
 
+SUBSCRIPTION_KEYBOARD = keyboards.subscription_keyboard(CHANNEL_USERNAME)
+
 def ask_for_subscription(message):
-    markup = InlineKeyboardMarkup()
-    markup.row(
-        InlineKeyboardButton('🔗 Kanalga o\'tish', url=f'https://t.me/{CHANNEL_USERNAME[1:]}'),
-        InlineKeyboardButton('✅ Tekshirish', callback_data='check_subscription')
-    )
     bot.send_message(
         message.chat.id,
         "🤖 <b>GarajHub Bot</b>\n\n"
         "Botdan foydalanish uchun avval kanalimizga obuna bo'ling 👇",
-        reply_markup=markup
+        reply_markup=SUBSCRIPTION_KEYBOARD
     )
 
-@bot.callback_query_handler(func=lambda call: call.data == 'check_subscription')
+@callback_router.route('check_subscription')
 def check_subscription_callback(call):
     user_id = call.from_user.id
     try:
-        chat_member = bot.get_chat_member(CHANNEL_USERNAME, user_id)
-        if chat_member.status in ['member', 'administrator', 'creator']:
+        # Foydalanuvchi hozirgina obuna bo'lgan bo'lishi mumkin: salbiy keshga ishonmaymiz
+        if is_subscribed(user_id, trust_negative=False):
             show_main_menu(call)
             bot.answer_callback_query(call.id, "✅ Obuna tasdiqlandi!")
         else:
@@ -401,6 +504,18 @@ def check_subscription_callback(call):
         logging.error(f"Obuna tekshirishda xatolik: {e}")
         bot.answer_callback_query(call.id, "⚠️ Xatolik yuz berdi!", show_alert=True)
 
+# Qadam kutilayotgan bo'lsa, xabar (matn yoki rasm) menyu tugmalaridan oldin shu qadamga boradi
+@bot.message_handler(func=lambda message: get_user_state(message.from_user.id) in STEP_HANDLERS,
+                     content_types=['text', 'photo'])
+def handle_conversation_step(message):
+    state, data = get_user_state_data(message.from_user.id)
+    handler = STEP_HANDLERS.get(state)
+    if handler:
+        handler(message, data)
+    else:
+        # Holat filtr va handler orasida o'zgargan
+        handle_other_messages(message)
+
 def show_main_menu(message_or_call):
     if isinstance(message_or_call, types.CallbackQuery):
         chat_id = message_or_call.message.chat.id
@@ -420,13 +535,11 @@ def show_main_menu(message_or_call):
     bot.send_message(chat_id, text, reply_markup=create_main_menu(user_id))
 
 # 2. PROFIL (To'g'rilangan versiya - bir xabarda)
-@bot.message_handler(func=lambda message: message.text == '👤 Profil')
+@text_command('👤 Profil')
 def show_profile(message):
     user_id = message.from_user.id
     set_user_state(user_id, 'in_profile')
     
-    markup = create_back_button()
-    
     user = get_user(user_id)
     if not user:
         save_user(user_id, message.from_user.username or "", message.from_user.first_name or "")
@@ -443,64 +556,43 @@ def show_profile(message):
         "🛠 <b>Tahrirlash uchun tugmalardan birini tanlang:</b>"
     )
     
-    markup_inline = InlineKeyboardMarkup(row_width=2)
-    markup_inline.add(
-        InlineKeyboardButton('✏️ Ism', callback_data='edit_first_name'),
-        InlineKeyboardButton('✏️ Familiya', callback_data='edit_last_name'),
-        InlineKeyboardButton('📞 Telefon', callback_data='edit_phone'),
-        InlineKeyboardButton('⚧️ Jins', callback_data='edit_gender'),
-        InlineKeyboardButton('🎂 Tug\'ilgan sana', callback_data='edit_birth_date'),
-        InlineKeyboardButton('📝 Bio', callback_data='edit_bio')
-    )
-    # Add inline back button to avoid sending an extra message with reply keyboard
-    markup_inline.add(InlineKeyboardButton('🔙 Orqaga', callback_data='back_to_main_menu'))
-
     # Faqat bitta xabar yuborish
-    bot.send_message(message.chat.id, profile_text, reply_markup=markup_inline)
+    bot.send_message(message.chat.id, profile_text, reply_markup=keyboards.PROFILE_KEYBOARD)
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('edit_'))
-def handle_edit_profile(call):
+@callback_router.route('edit_profile', str, legacy='edit')
+def handle_edit_profile(call, field: str):
     user_id = call.from_user.id
-    set_user_state(user_id, f'editing_{call.data}')
-    
-    if call.data == 'edit_first_name':
-        msg = bot.send_message(call.message.chat.id, "📝 <b>Ismingizni kiriting:</b>", reply_markup=create_back_button())
-        bot.register_next_step_handler(msg, process_first_name)
-    
-    elif call.data == 'edit_last_name':
-        msg = bot.send_message(call.message.chat.id, "📝 <b>Familiyangizni kiriting:</b>", reply_markup=create_back_button())
-        bot.register_next_step_handler(msg, process_last_name)
-    
-    elif call.data == 'edit_phone':
-        msg = bot.send_message(call.message.chat.id, 
-                              "📱 <b>Telefon raqamingizni kiriting:</b>\n\n"
-                              "Masalan: <code>+998901234567</code>", 
-                              reply_markup=create_back_button())
-        bot.register_next_step_handler(msg, process_phone)
-    
-    elif call.data == 'edit_gender':
-        markup = InlineKeyboardMarkup(row_width=2)
-        markup.add(
-            InlineKeyboardButton('👨 Erkak', callback_data='gender_male'),
-            InlineKeyboardButton('👩 Ayol', callback_data='gender_female'),
-            InlineKeyboardButton('🔙 Orqaga', callback_data='back_to_profile')
-        )
-        bot.edit_message_text("⚧️ <b>Jinsingizni tanlang:</b>", call.message.chat.id, call.message.message_id, reply_markup=markup)
+    set_user_state(user_id, f'editing_{field}')
     
-    elif call.data == 'edit_birth_date':
-        msg = bot.send_message(call.message.chat.id, 
-                              "🎂 <b>Tug'ilgan sanangizni kiriting (kun-oy-yil)</b>\n"
-                              "Masalan: <code>30-04-2010</code>", 
-                              reply_markup=create_back_button())
-        bot.register_next_step_handler(msg, process_birth_date)
+    if field == 'first_name':
+        bot.send_message(call.message.chat.id, "📝 <b>Ismingizni kiriting:</b>", reply_markup=create_back_button())
     
-    elif call.data == 'edit_bio':
-        msg = bot.send_message(call.message.chat.id, "📝 <b>Bio kiriting:</b>", reply_markup=create_back_button())
-        bot.register_next_step_handler(msg, process_bio)
+    elif field == 'last_name':
+        bot.send_message(call.message.chat.id, "📝 <b>Familiyangizni kiriting:</b>", reply_markup=create_back_button())
+    
+    elif field == 'phone':
+        bot.send_message(call.message.chat.id, 
+                         "📱 <b>Telefon raqamingizni kiriting:</b>\n\n"
+                         "Masalan: <code>+998901234567</code>", 
+                         reply_markup=create_back_button())
+    
+    elif field == 'gender':
+        bot.edit_message_text("⚧️ <b>Jinsingizni tanlang:</b>", call.message.chat.id, call.message.message_id,
+                              reply_markup=keyboards.GENDER_KEYBOARD)
+    
+    elif field == 'birth_date':
+        bot.send_message(call.message.chat.id, 
+                         "🎂 <b>Tug'ilgan sanangizni kiriting (kun-oy-yil)</b>\n"
+                         "Masalan: <code>30-04-2010</code>", 
+                         reply_markup=create_back_button())
+    
+    elif field == 'bio':
+        bot.send_message(call.message.chat.id, "📝 <b>Bio kiriting:</b>", reply_markup=create_back_button())
     
     bot.answer_callback_query(call.id)
 
-def process_first_name(message):
+@conversation_step('editing_first_name')
+def process_first_name(message, data):
     user_id = message.from_user.id
     
     if message.text == '🔙 Orqaga':
@@ -512,7 +604,8 @@ def process_first_name(message):
     bot.send_message(message.chat.id, "✅ <b>Ismingiz muvaffaqiyatli saqlandi</b>", reply_markup=create_back_button())
     show_profile(message)
 
-def process_last_name(message):
+@conversation_step('editing_last_name')
+def process_last_name(message, data):
     user_id = message.from_user.id
     
     if message.text == '🔙 Orqaga':
@@ -524,7 +617,8 @@ def process_last_name(message):
     bot.send_message(message.chat.id, "✅ <b>Familiyangiz muvaffaqiyatli saqlandi</b>", reply_markup=create_back_button())
     show_profile(message)
 
-def process_phone(message):
+@conversation_step('editing_phone')
+def process_phone(message, data):
     user_id = message.from_user.id
     
     if message.text == '🔙 Orqaga':
@@ -536,10 +630,10 @@ def process_phone(message):
     bot.send_message(message.chat.id, "✅ <b>Telefon raqami muvaffaqiyatli saqlandi</b>", reply_markup=create_back_button())
     show_profile(message)
 
-@bot.callback_query_handler(func=lambda call: call.data in ['gender_male', 'gender_female'])
-def process_gender(call):
+@callback_router.route('gender', str)
+def process_gender(call, gender_code: str):
     user_id = call.from_user.id
-    gender = 'Erkak' if call.data == 'gender_male' else 'Ayol'
+    gender = 'Erkak' if gender_code == 'male' else 'Ayol'
     update_user_field(user_id, 'gender', gender)
     
     # O'rniga yangi xabar yuborish
@@ -550,12 +644,13 @@ def process_gender(call):
     show_profile(call.message)
     bot.answer_callback_query(call.id)
 
-@bot.callback_query_handler(func=lambda call: call.data == 'back_to_profile')
+@callback_router.route('back_to_profile')
 def back_to_profile(call):
     show_profile(call.message)
     bot.answer_callback_query(call.id)
 
-def process_birth_date(message):
+@conversation_step('editing_birth_date')
+def process_birth_date(message, data):
     user_id = message.from_user.id
     
     if message.text == '🔙 Orqaga':
@@ -567,7 +662,8 @@ def process_birth_date(message):
     bot.send_message(message.chat.id, "✅ <b>Tug'ilgan sana muvaffaqiyatli saqlandi</b>", reply_markup=create_back_button())
     show_profile(message)
 
-def process_bio(message):
+@conversation_step('editing_bio')
+def process_bio(message, data):
     user_id = message.from_user.id
     
     if message.text == '🔙 Orqaga':
@@ -580,74 +676,112 @@ def process_bio(message):
     show_profile(message)
 
 # 3. STARTUPLAR (To'g'rilangan)
-@bot.message_handler(func=lambda message: message.text == '🌐 Startuplar')
+@text_command('🌐 Startuplar')
 def show_startups(message):
     user_id = message.from_user.id
     set_user_state(user_id, 'viewing_startups')
     
     markup = create_back_button()
     bot.send_message(message.chat.id, "🌐 <b>Startuplar ro'yxati:</b>", reply_markup=markup)
-    show_startup_page(message.chat.id, 1)
+    take_carousel_snapshot(user_id)
+    show_startup_page(message.chat.id, user_id, 0)
 
-def show_startup_page(chat_id, page):
-    startups, total = get_active_startups(page, per_page=1)
-    
-    if not startups:
-        bot.send_message(chat_id, "📭 <b>Hozircha startup mavjud emas.</b>\n\n🚀 <i>@GarajHub_uz bilan o'zingizning startupingizni yarating!</i>", reply_markup=create_back_button())
-        return
+def edit_or_send(message, text: str, markup=None, photo: Optional[str] = None):
+    """Xabarni joyida yangilaydi (bitta API chaqiruv); kontent turi o'zgarsa o'chirib qayta yuboradi."""
+    chat_id = message.chat.id
+    try:
+        if photo and message.content_type == 'photo':
+            bot.edit_message_media(types.InputMediaPhoto(photo, caption=text, parse_mode='HTML'),
+                                   chat_id, message.message_id, reply_markup=markup)
+            return
+        if not photo and message.content_type == 'text':
+            bot.edit_message_text(text, chat_id, message.message_id, reply_markup=markup)
+            return
+    except telebot.apihelper.ApiTelegramException as e:
+        if 'message is not modified' in e.description:
+            return
+        logging.warning(f"Xabarni tahrirlab bo'lmadi, qayta yuboriladi: {e.description}")
     
-    startup = startups[0]
-    user = get_user(startup['owner_id'])
-    owner_name = f"{user.get('first_name', '')} {user.get('last_name', '')}".strip() if user else "Noma'lum"
-    owner_contact = f"@{user.get('username', '')}" if user and user.get('username') else owner_name
+    try:
+        bot.delete_message(chat_id, message.message_id)
+    except Exception:
+        pass
+    if photo:
+        bot.send_photo(chat_id, photo, caption=text, reply_markup=markup)
+    else:
+        bot.send_message(chat_id, text, reply_markup=markup)
+
+def render_startup_page(user_id: int, index: int = 0):
+    """Foydalanuvchi snapshotidagi karta: (text, markup, logo) yoki faol startup bo'lmasa None."""
+    startup, index, total = get_carousel_card(user_id, index)
+    if startup is None:
+        return None
     
-    total_pages = max(1, total)
+    owner_name = format_owner_name(startup)
+    owner_contact = f"@{startup['owner_username']}" if startup.get('owner_username') else owner_name
     
     text = (
         f"🎯 <b>{startup['name']}</b>\n\n"
         f"📌 <b>Tavsif:</b>\n{startup['description']}\n\n"
         f"👤 <b>Muallif:</b> {owner_contact}\n\n"
-        f"📄 <b>Sahifa:</b> {page}/{total_pages}"
+        f"📄 <b>Sahifa:</b> {index + 1}/{total}"
     )
     
     markup = InlineKeyboardMarkup()
     markup.add(InlineKeyboardButton('🤝 Startupga qo\'shilish', 
-                                   callback_data=f'join_startup_{startup["startup_id"]}'))
+                                   callback_data=encode_callback('join_startup', startup['startup_id'])))
     
     nav_buttons = []
-    if page > 1:
-        nav_buttons.append(InlineKeyboardButton('⏮️ Oldingi', callback_data=f'startup_page_{page-1}'))
-    if page < total_pages:
-        nav_buttons.append(InlineKeyboardButton('⏭️ Keyingi', callback_data=f'startup_page_{page+1}'))
+    if index > 0:
+        nav_buttons.append(InlineKeyboardButton('⏮️ Oldingi', callback_data=encode_callback('carousel', index - 1)))
+    if index < total - 1:
+        nav_buttons.append(InlineKeyboardButton('⏭️ Keyingi', callback_data=encode_callback('carousel', index + 1)))
     
     if nav_buttons:
         markup.row(*nav_buttons)
     
     markup.add(InlineKeyboardButton('🔙 Orqaga', callback_data='back_to_main_menu'))
     
+    return text, markup, startup.get('logo')
+
+def show_startup_page(chat_id, user_id: int, index: int = 0):
+    card = render_startup_page(user_id, index)
+    if card is None:
+        bot.send_message(chat_id, "📭 <b>Hozircha startup mavjud emas.</b>\n\n🚀 <i>@GarajHub_uz bilan o'zingizning startupingizni yarating!</i>", reply_markup=create_back_button())
+        return
+    
+    text, markup, logo = card
     try:
-        if startup.get('logo'):
-            bot.send_photo(chat_id, startup['logo'], caption=text, reply_markup=markup)
+        if logo:
+            bot.send_photo(chat_id, logo, caption=text, reply_markup=markup)
         else:
             bot.send_message(chat_id, text, reply_markup=markup)
     except Exception as e:
         logging.error(f"Xabar yuborishda xatolik: {e}")
         bot.send_message(chat_id, text, reply_markup=markup)
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('startup_page_'))
-def handle_startup_page(call):
+@callback_router.route('carousel', int)
+def handle_startup_page(call, index: int):
     try:
-        page = int(call.data.split('_')[2])
-        bot.delete_message(call.message.chat.id, call.message.message_id)
-        show_startup_page(call.message.chat.id, page)
+        card = render_startup_page(call.from_user.id, index)
+        if card is None:
+            bot.delete_message(call.message.chat.id, call.message.message_id)
+            show_startup_page(call.message.chat.id, call.from_user.id)
+        else:
+            text, markup, logo = card
+            edit_or_send(call.message, text, markup, logo)
         bot.answer_callback_query(call.id)
     except:
         bot.answer_callback_query(call.id, "⚠️ Xatolik yuz berdi!", show_alert=True)
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('join_startup_'))
-def handle_join_startup(call):
+# Kursorli eski sahifa tugmalari: sahifa raqami snapshot indeksiga aylantiriladi
+@callback_router.route('startup_page', int, str, str)
+def handle_legacy_startup_page(call, page: int, direction: str = 'n', cursor: Optional[str] = None):
+    handle_startup_page(call, page - 1)
+
+@callback_router.route('join_startup', int)
+def handle_join_startup(call, startup_id: int):
     try:
-        startup_id = int(call.data.split('_')[2])
         user_id = call.from_user.id
         
         # Check if already joined
@@ -682,8 +816,8 @@ def handle_join_startup(call):
                 
                 markup = InlineKeyboardMarkup()
                 markup.add(
-                    InlineKeyboardButton('✅ Tasdiqlash', callback_data=f'approve_join_{request_id}'),
-                    InlineKeyboardButton('❌ Rad etish', callback_data=f'reject_join_{request_id}')
+                    InlineKeyboardButton('✅ Tasdiqlash', callback_data=encode_callback('approve_join', request_id)),
+                    InlineKeyboardButton('❌ Rad etish', callback_data=encode_callback('reject_join', request_id))
                 )
                 
                 try:
@@ -697,19 +831,15 @@ def handle_join_startup(call):
         logging.error(f"Join startup xatosi: {e}")
         bot.answer_callback_query(call.id, "⚠️ Xatolik yuz berdi!", show_alert=True)
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('approve_join_'))
-def approve_join_request(call):
+@callback_router.route('approve_join', int)
+def approve_join_request(call, request_id: int):
     try:
-        request_id = int(call.data.split('_')[2])
         
         # Get request details
-        conn = sqlite3.connect('garajhub.db', check_same_thread=False)
-        cursor = conn.cursor()
-        cursor.execute('SELECT startup_id, user_id FROM startup_members WHERE id = ?', (request_id,))
-        result = cursor.fetchone()
+        result = get_join_request(request_id)
         
         if result:
-            startup_id, user_id = result
+            startup_id, user_id = result['startup_id'], result['user_id']
             update_join_request(request_id, 'accepted')
             
             # Send group link to user
@@ -734,25 +864,19 @@ def approve_join_request(call):
             )
         else:
             bot.answer_callback_query(call.id, "❌ So'rov topilmadi!", show_alert=True)
-        
-        conn.close()
     except Exception as e:
         logging.error(f"Approve join xatosi: {e}")
         bot.answer_callback_query(call.id, "⚠️ Xatolik yuz berdi!", show_alert=True)
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('reject_join_'))
-def reject_join_request(call):
+@callback_router.route('reject_join', int)
+def reject_join_request(call, request_id: int):
     try:
-        request_id = int(call.data.split('_')[2])
         
         # Get user_id for notification
-        conn = sqlite3.connect('garajhub.db', check_same_thread=False)
-        cursor = conn.cursor()
-        cursor.execute('SELECT user_id FROM startup_members WHERE id = ?', (request_id,))
-        result = cursor.fetchone()
+        result = get_join_request(request_id)
         
         if result:
-            user_id = result[0]
+            user_id = result['user_id']
             update_join_request(request_id, 'rejected')
             
             # Notify user
@@ -769,14 +893,12 @@ def reject_join_request(call):
             )
         else:
             bot.answer_callback_query(call.id, "❌ So'rov topilmadi!", show_alert=True)
-        
-        conn.close()
     except Exception as e:
         logging.error(f"Reject join xatosi: {e}")
         bot.answer_callback_query(call.id, "⚠️ Xatolik yuz berdi!", show_alert=True)
 
 # 4. MENING STARTUPLARIM (To'g'rilangan - A'zolar xatosi)
-@bot.message_handler(func=lambda message: message.text == '📌 Mening startuplarim')
+@text_command('📌 Mening startuplarim')
 def show_my_startups(message):
     user_id = message.from_user.id
     set_user_state(user_id, 'viewing_my_startups')
@@ -785,21 +907,19 @@ def show_my_startups(message):
     bot.send_message(message.chat.id, "📌 <b>Mening startuplarim:</b>", reply_markup=markup)
     show_my_startups_page(message.chat.id, user_id, 1)
 
-def show_my_startups_page(chat_id, user_id, page):
-    startups = get_startups_by_owner(user_id)
+def show_my_startups_page(chat_id, user_id, page, message=None):
+    """``message`` berilsa, ro'yxat shu xabar o'rnida tahrirlanadi."""
+    per_page = 5
+    page_startups, total, page = get_startups_by_owner_page(user_id, page, per_page)
     
-    if not startups:
+    if not total:
+        if message is not None:
+            bot.delete_message(chat_id, message.message_id)
         bot.send_message(chat_id, "📭 <b>Sizda hali startup mavjud emas.</b>", reply_markup=create_back_button())
         return
     
-    per_page = 5
-    total = len(startups)
     total_pages = (total + per_page - 1) // per_page
-    page = min(max(1, page), total_pages)
-    
     start_idx = (page - 1) * per_page
-    end_idx = min(start_idx + per_page, total)
-    page_startups = startups[start_idx:end_idx]
     
     text = f"<b>📌 Mening startuplarim</b>\n📄 Sahifa: <b>{page}/{total_pages}</b>\n\n"
     for i, startup in enumerate(page_startups, start=start_idx + 1):
@@ -819,56 +939,51 @@ def show_my_startups_page(chat_id, user_id, page):
     end_page = min(total_pages, start_page + 4)
     
     for i in range(start_page, end_page + 1):
-        buttons.append(InlineKeyboardButton(f'{i}', callback_data=f'my_startup_page_{i}'))
+        buttons.append(InlineKeyboardButton(f'{i}', callback_data=encode_callback('my_startup_page', i)))
     
     if buttons:
         markup.row(*buttons)
     
     # Navigation
     if page > 1:
-        markup.add(InlineKeyboardButton('⏮️ Oldingi', callback_data=f'my_startup_page_{page-1}'))
+        markup.add(InlineKeyboardButton('⏮️ Oldingi', callback_data=encode_callback('my_startup_page', page - 1)))
     if page < total_pages:
-        markup.add(InlineKeyboardButton('⏭️ Keyingi', callback_data=f'my_startup_page_{page+1}'))
+        markup.add(InlineKeyboardButton('⏭️ Keyingi', callback_data=encode_callback('my_startup_page', page + 1)))
     
     # Startup selection
     if page_startups:
         for i, startup in enumerate(page_startups):
             markup.add(InlineKeyboardButton(f'{start_idx + i + 1}. {startup["name"][:15]}...', 
-                                           callback_data=f'view_startup_{startup["startup_id"]}'))
+                                           callback_data=encode_callback('view_startup', startup['startup_id'])))
     
     markup.add(InlineKeyboardButton('🔙 Orqaga', callback_data='back_to_main_menu'))
     
-    bot.send_message(chat_id, text, reply_markup=markup)
+    if message is not None:
+        edit_or_send(message, text, markup)
+    else:
+        bot.send_message(chat_id, text, reply_markup=markup)
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('my_startup_page_'))
-def handle_my_startup_page(call):
+@callback_router.route('my_startup_page', int)
+def handle_my_startup_page(call, page: int):
     try:
-        page = int(call.data.split('_')[3])
-        bot.delete_message(call.message.chat.id, call.message.message_id)
-        show_my_startups_page(call.message.chat.id, call.from_user.id, page)
+        show_my_startups_page(call.message.chat.id, call.from_user.id, page, call.message)
         bot.answer_callback_query(call.id)
     except:
         bot.answer_callback_query(call.id, "⚠️ Xatolik yuz berdi!", show_alert=True)
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('view_startup_'))
-def view_startup_details(call):
+@callback_router.route('view_startup', int)
+def view_startup_details(call, startup_id: int):
     try:
-        startup_id = int(call.data.split('_')[2])
-        startup = get_startup(startup_id)
+        startup = get_startup_with_owner(startup_id)
         
         if not startup:
             bot.answer_callback_query(call.id, "❌ Startup topilmadi!", show_alert=True)
             return
         
-        user = get_user(startup['owner_id'])
-        owner_name = f"{user.get('first_name', '')} {user.get('last_name', '')}".strip() if user else "Noma'lum"
+        owner_name = format_owner_name(startup)
         
         # Get member count
-        conn = sqlite3.connect('garajhub.db', check_same_thread=False)
-        cursor = conn.cursor()
-        cursor.execute('SELECT COUNT(*) FROM startup_members WHERE startup_id = ? AND status = "accepted"', (startup_id,))
-        member_count = cursor.fetchone()[0]
-        conn.close()
+        member_count = count_startup_members(startup_id)
         
         status_texts = {
             'pending': '⏳ Kutilmoqda',
@@ -900,12 +1015,12 @@ def view_startup_details(call):
         if startup['status'] == 'pending':
             markup.add(InlineKeyboardButton('⏳ Admin tasdigini kutyapti', callback_data='waiting_approval'))
         elif startup['status'] == 'active':
-            markup.add(InlineKeyboardButton('👥 A\'zolar', callback_data=f'view_members_{startup_id}_1'))
-            markup.add(InlineKeyboardButton('⏹️ Yakunlash', callback_data=f'complete_startup_{startup_id}'))
+            markup.add(InlineKeyboardButton('👥 A\'zolar', callback_data=encode_callback('view_members', startup_id, 1)))
+            markup.add(InlineKeyboardButton('⏹️ Yakunlash', callback_data=encode_callback('complete_startup', startup_id)))
         elif startup['status'] == 'completed':
-            markup.add(InlineKeyboardButton('👥 A\'zolar', callback_data=f'view_members_{startup_id}_1'))
+            markup.add(InlineKeyboardButton('👥 A\'zolar', callback_data=encode_callback('view_members', startup_id, 1)))
             if startup.get('results'):
-                markup.add(InlineKeyboardButton('📊 Natijalar', callback_data=f'view_results_{startup_id}'))
+                markup.add(InlineKeyboardButton('📊 Natijalar', callback_data=encode_callback('view_results', startup_id)))
         elif startup['status'] == 'rejected':
             markup.add(InlineKeyboardButton('❌ Rad etilgan', callback_data='rejected_info'))
         
@@ -923,32 +1038,22 @@ def view_startup_details(call):
         logging.error(f"View startup xatosi: {e}")
         bot.answer_callback_query(call.id, "⚠️ Xatolik yuz berdi!", show_alert=True)
 
-@bot.callback_query_handler(func=lambda call: call.data == 'back_to_my_startups')
+@callback_router.route('back_to_my_startups')
 def back_to_my_startups(call):
     try:
-        bot.delete_message(call.message.chat.id, call.message.message_id)
-        show_my_startups_page(call.message.chat.id, call.from_user.id, 1)
+        show_my_startups_page(call.message.chat.id, call.from_user.id, 1, call.message)
         bot.answer_callback_query(call.id)
     except:
         bot.answer_callback_query(call.id, "⚠️ Xatolik yuz berdi!", show_alert=True)
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('view_members_'))
-def view_startup_members(call):
+@callback_router.route('view_members', int, int)
+def view_startup_members(call, startup_id: int, page: int = 1):
     try:
-        parts = call.data.split('_')
-        startup_id = int(parts[2])
-        page = int(parts[3])
         
         members, total = get_startup_members(startup_id, page)
         # Ensure total_pages is always defined to avoid UnboundLocalError
         total_pages = max(1, (total + 4) // 5)
         
-        # Avvalgi xabarni o'chirish
-        try:
-            bot.delete_message(call.message.chat.id, call.message.message_id)
-        except:
-            pass
-        
         if not members:
             text = "👥 <b>A'zolar</b>\n\n📭 <b>Hozircha a'zolar yo'q.</b>"
             markup = InlineKeyboardMarkup()
@@ -969,25 +1074,25 @@ def view_startup_members(call):
         markup = InlineKeyboardMarkup()
         nav_buttons = []
         if page > 1:
-            nav_buttons.append(InlineKeyboardButton('⏮️ Oldingi', callback_data=f'view_members_{startup_id}_{page-1}'))
+            nav_buttons.append(InlineKeyboardButton('⏮️ Oldingi', callback_data=encode_callback('view_members', startup_id, page - 1)))
         if page < total_pages:
-            nav_buttons.append(InlineKeyboardButton('⏭️ Keyingi', callback_data=f'view_members_{startup_id}_{page+1}'))
+            nav_buttons.append(InlineKeyboardButton('⏭️ Keyingi', callback_data=encode_callback('view_members', startup_id, page + 1)))
         
         if nav_buttons:
             markup.row(*nav_buttons)
         
-        markup.add(InlineKeyboardButton('🔙 Orqaga', callback_data=f'view_startup_{startup_id}'))
+        markup.add(InlineKeyboardButton('🔙 Orqaga', callback_data=encode_callback('view_startup', startup_id)))
         
-        bot.send_message(call.message.chat.id, text, reply_markup=markup)
+        # Sahifa almashtirish shu xabarni tahrirlaydi; rasmli startup kartasidan kelganda qayta yuboriladi
+        edit_or_send(call.message, text, markup)
         bot.answer_callback_query(call.id)
     except Exception as e:
         logging.error(f"View members xatosi: {e}")
         bot.answer_callback_query(call.id, "⚠️ Xatolik yuz berdi!", show_alert=True)
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('view_results_'))
-def view_startup_results(call):
+@callback_router.route('view_results', int)
+def view_startup_results(call, startup_id: int):
     try:
-        startup_id = int(call.data.split('_')[2])
         startup = get_startup(startup_id)
         
         if not startup or not startup.get('results'):
@@ -1002,7 +1107,7 @@ def view_startup_results(call):
         )
         
         markup = InlineKeyboardMarkup()
-        markup.add(InlineKeyboardButton('🔙 Orqaga', callback_data=f'view_startup_{startup_id}'))
+        markup.add(InlineKeyboardButton('🔙 Orqaga', callback_data=encode_callback('view_startup', startup_id)))
         
         bot.send_message(call.message.chat.id, text, reply_markup=markup)
         bot.answer_callback_query(call.id)
@@ -1010,31 +1115,30 @@ def view_startup_results(call):
         logging.error(f"View results xatosi: {e}")
         bot.answer_callback_query(call.id, "⚠️ Xatolik yuz berdi!", show_alert=True)
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('complete_startup_'))
-def complete_startup(call):
+@callback_router.route('complete_startup', int)
+def complete_startup(call, startup_id: int):
     try:
-        startup_id = int(call.data.split('_')[2])
         user_id = call.from_user.id
-        set_user_state(user_id, f'completing_startup_{startup_id}')
+        set_user_state(user_id, 'completing_startup_results', {'startup_id': startup_id})
         
-        msg = bot.send_message(call.message.chat.id, "📝 <b>Nimalarga erishdingiz?</b>\nMatn yozing:", 
-                              reply_markup=create_back_button())
-        bot.register_next_step_handler(msg, process_startup_results, startup_id)
+        bot.send_message(call.message.chat.id, "📝 <b>Nimalarga erishdingiz?</b>\nMatn yozing:", 
+                         reply_markup=create_back_button())
         
         bot.answer_callback_query(call.id)
     except:
         bot.answer_callback_query(call.id, "⚠️ Xatolik yuz berdi!", show_alert=True)
 
-def process_startup_results(message, startup_id):
+@conversation_step('completing_startup_results')
+def process_startup_results(message, data):
     user_id = message.from_user.id
+    startup_id = data['startup_id']
     
     if message.text == '🔙 Orqaga':
         clear_user_state(user_id)
         # Go back to startup view
-        startup = get_startup(startup_id)
+        startup = get_startup_with_owner(startup_id)
         if startup:
-            user = get_user(startup['owner_id'])
-            owner_name = f"{user.get('first_name', '')} {user.get('last_name', '')}".strip() if user else "Noma'lum"
+            owner_name = format_owner_name(startup)
             
             text = (
                 f"🎯 <b>Nomi:</b> {startup['name']}\n"
@@ -1044,79 +1148,65 @@ def process_startup_results(message, startup_id):
             )
             
             markup = InlineKeyboardMarkup()
-            markup.add(InlineKeyboardButton('👥 A\'zolar', callback_data=f'view_members_{startup_id}_1'))
-            markup.add(InlineKeyboardButton('⏹️ Yakunlash', callback_data=f'complete_startup_{startup_id}'))
+            markup.add(InlineKeyboardButton('👥 A\'zolar', callback_data=encode_callback('view_members', startup_id, 1)))
+            markup.add(InlineKeyboardButton('⏹️ Yakunlash', callback_data=encode_callback('complete_startup', startup_id)))
             markup.add(InlineKeyboardButton('🔙 Orqaga', callback_data='back_to_my_startups'))
             
             bot.send_message(message.chat.id, text, reply_markup=markup)
         return
     
-    results_text = message.text
+    if not message.text:
+        bot.send_message(message.chat.id, "📝 <b>Nimalarga erishdingiz?</b>\nMatn yozing:", 
+                         reply_markup=create_back_button())
+        return
     
-    msg = bot.send_message(message.chat.id, "🖼 <b>Natijalar rasmini yuboring:</b>", reply_markup=create_back_button())
-    bot.register_next_step_handler(msg, process_startup_photo, startup_id, results_text)
+    set_user_state(user_id, 'completing_startup_photo', {'startup_id': startup_id, 'results': message.text})
+    bot.send_message(message.chat.id, "🖼 <b>Natijalar rasmini yuboring:</b>", reply_markup=create_back_button())
 
-def process_startup_photo(message, startup_id, results_text):
+@conversation_step('completing_startup_photo')
+def process_startup_photo(message, data):
     user_id = message.from_user.id
+    startup_id = data['startup_id']
+    results_text = data['results']
     
     if message.text == '🔙 Orqaga':
-        clear_user_state(user_id)
-        msg = bot.send_message(message.chat.id, "📝 <b>Nimalarga erishdingiz?</b>\nMatn yozing:", 
-                              reply_markup=create_back_button())
-        bot.register_next_step_handler(msg, process_startup_results, startup_id)
+        set_user_state(user_id, 'completing_startup_results', {'startup_id': startup_id})
+        bot.send_message(message.chat.id, "📝 <b>Nimalarga erishdingiz?</b>\nMatn yozing:", 
+                         reply_markup=create_back_button())
         return
     
     if message.photo:
         photo_id = message.photo[-1].file_id
         
-        # Update startup status and results
-        conn = sqlite3.connect('garajhub.db', check_same_thread=False)
-        cursor = conn.cursor()
-        cursor.execute('UPDATE startups SET status = "completed", results = ?, ended_at = CURRENT_TIMESTAMP WHERE startup_id = ?', 
-                      (results_text, startup_id))
-        conn.commit()
+        # Update startup status and results, get all members
+        members = complete_startup_record(startup_id, results_text)
         
-        # Get all members
-        cursor.execute('SELECT user_id FROM startup_members WHERE startup_id = ? AND status = "accepted"', (startup_id,))
-        members = cursor.fetchall()
-        conn.close()
+        startup = get_startup_with_owner(startup_id)
         
-        startup = get_startup(startup_id)
-        
-        # Send notification to all members
+        # A'zolarga xabar fonda, broadcast ishi sifatida (rate limit, qayta urinish, natijalar bazada)
         end_date = datetime.now().strftime('%d-%m-%Y')
-        success_count = 0
-        
-        for member in members:
-            try:
-                bot.send_photo(
-                    member[0],
-                    photo_id,
-                    caption=(
-                        f"🏁 <b>Startup yakunlandi</b>\n\n"
-                        f"🎯 <b>{startup['name']}</b>\n"
-                        f"📅 <b>Yakunlangan sana:</b> {end_date}\n"
-                        f"📝 <b>Natijalar:</b> {results_text}"
-                    )
-                )
-                success_count += 1
-            except:
-                pass
+        if members:
+            caption = (
+                f"🏁 <b>Startup yakunlandi</b>\n\n"
+                f"🎯 <b>{startup['name']}</b>\n"
+                f"📅 <b>Yakunlangan sana:</b> {end_date}\n"
+                f"📝 <b>Natijalar:</b> {results_text}"
+            )
+            job_id = broadcast.create_job('photo', caption, photo=photo_id, user_ids=members)
+            broadcaster.start(job_id)
         
         bot.send_message(message.chat.id, 
                         f"✅ <b>Startup muvaffaqiyatli yakunlandi!</b>\n\n"
-                        f"📤 Xabar yuborildi: {success_count} ta a'zoga", 
+                        f"📤 Xabar yuborilmoqda: {len(members)} ta a'zoga", 
                         reply_markup=create_back_button())
         
         clear_user_state(user_id)
         
         # Show updated startup details
         markup = InlineKeyboardMarkup()
-        markup.add(InlineKeyboardButton('🔙 Orqaga', callback_data=f'view_startup_{startup_id}'))
+        markup.add(InlineKeyboardButton('🔙 Orqaga', callback_data=encode_callback('view_startup', startup_id)))
         
-        startup = get_startup(startup_id)
-        user = get_user(startup['owner_id'])
-        owner_name = f"{user.get('first_name', '')} {user.get('last_name', '')}".strip() if user else "Noma'lum"
+        owner_name = format_owner_name(startup)
         
         text = (
             f"🎯 <b>Nomi:</b> {startup['name']}\n"
@@ -1130,19 +1220,18 @@ def process_startup_photo(message, startup_id, results_text):
         bot.send_message(message.chat.id, text, reply_markup=markup)
     else:
         bot.send_message(message.chat.id, "⚠️ <b>Iltimos, rasm yuboring!</b>", reply_markup=create_back_button())
-        msg = bot.send_message(message.chat.id, "🖼 <b>Natijalar rasmini yuboring:</b>", reply_markup=create_back_button())
-        bot.register_next_step_handler(msg, process_startup_photo, startup_id, results_text)
+        bot.send_message(message.chat.id, "🖼 <b>Natijalar rasmini yuboring:</b>", reply_markup=create_back_button())
 
 # 5. STARTUP YARATISH
-@bot.message_handler(func=lambda message: message.text == '➕ Startup yaratish')
+@text_command('➕ Startup yaratish')
 def start_creation(message):
     user_id = message.from_user.id
-    set_user_state(user_id, 'creating_startup')
+    set_user_state(user_id, 'creating_startup_name', {'owner_id': user_id})
     
     markup = create_back_button()
     bot.send_message(message.chat.id, "🚀 <b>Yangi startup yaratamiz!</b>\n\n📝 <b>Startup nomini kiriting:</b>", reply_markup=markup)
-    bot.register_next_step_handler(message, process_startup_name, {'owner_id': user_id})
 
+@conversation_step('creating_startup_name')
 def process_startup_name(message, data):
     user_id = message.from_user.id
     
@@ -1152,9 +1241,10 @@ def process_startup_name(message, data):
         return
     
     data['name'] = message.text
-    msg = bot.send_message(message.chat.id, "📝 <b>Startup tavsifini kiriting:</b>", reply_markup=create_back_button())
-    bot.register_next_step_handler(msg, process_startup_description, data)
+    set_user_state(user_id, 'creating_startup_description', data)
+    bot.send_message(message.chat.id, "📝 <b>Startup tavsifini kiriting:</b>", reply_markup=create_back_button())
 
+@conversation_step('creating_startup_description')
 def process_startup_description(message, data):
     user_id = message.from_user.id
     
@@ -1164,9 +1254,10 @@ def process_startup_description(message, data):
         return
     
     data['description'] = message.text
-    msg = bot.send_message(message.chat.id, "🖼 <b>Logo (rasm) yuboring:</b>", reply_markup=create_back_button())
-    bot.register_next_step_handler(msg, process_startup_logo, data)
+    set_user_state(user_id, 'creating_startup_logo', data)
+    bot.send_message(message.chat.id, "🖼 <b>Logo (rasm) yuboring:</b>", reply_markup=create_back_button())
 
+@conversation_step('creating_startup_logo')
 def process_startup_logo(message, data):
     user_id = message.from_user.id
     
@@ -1177,15 +1268,15 @@ def process_startup_logo(message, data):
     
     if message.photo:
         data['logo'] = message.photo[-1].file_id
-        msg = bot.send_message(message.chat.id, 
-                              "🔗 <b>Guruh yoki kanal havolasini kiriting (majburiy):</b>\n\n"
-                              "Masalan: <code>https://t.me/group_name</code>", 
-                              reply_markup=create_back_button())
-        bot.register_next_step_handler(msg, process_startup_group_link, data)
+        set_user_state(user_id, 'creating_startup_group_link', data)
+        bot.send_message(message.chat.id, 
+                         "🔗 <b>Guruh yoki kanal havolasini kiriting (majburiy):</b>\n\n"
+                         "Masalan: <code>https://t.me/group_name</code>", 
+                         reply_markup=create_back_button())
     else:
-        msg = bot.send_message(message.chat.id, "⚠️ <b>Iltimos, rasm yuboring!</b>", reply_markup=create_back_button())
-        bot.register_next_step_handler(msg, process_startup_logo, data)
+        bot.send_message(message.chat.id, "⚠️ <b>Iltimos, rasm yuboring!</b>", reply_markup=create_back_button())
 
+@conversation_step('creating_startup_group_link')
 def process_startup_group_link(message, data):
     user_id = message.from_user.id
     
@@ -1204,9 +1295,8 @@ def process_startup_group_link(message, data):
     )
     
     # Send to admin for approval
-    startup = get_startup(startup_id)
-    user = get_user(data['owner_id'])
-    owner_name = f"{user.get('first_name', '')} {user.get('last_name', '')}".strip() if user else "Noma'lum"
+    startup = get_startup_with_owner(startup_id)
+    owner_name = format_owner_name(startup)
     
     text = (
         f"🆕 <b>Yangi startup yaratildi!</b>\n\n"
@@ -1218,8 +1308,8 @@ def process_startup_group_link(message, data):
     
     markup = InlineKeyboardMarkup()
     markup.add(
-        InlineKeyboardButton('✅ Tasdiqlash', callback_data=f'admin_approve_{startup_id}'),
-        InlineKeyboardButton('❌ Rad etish', callback_data=f'admin_reject_{startup_id}')
+        InlineKeyboardButton('✅ Tasdiqlash', callback_data=encode_callback('admin_approve', startup_id)),
+        InlineKeyboardButton('❌ Rad etish', callback_data=encode_callback('admin_reject', startup_id))
     )
     
     try:
@@ -1242,21 +1332,11 @@ def process_startup_group_link(message, data):
     show_main_menu(message)
 
 # ADMIN PANEL (To'liq to'g'rilangan)
-@bot.message_handler(func=lambda message: message.text == '🛠 Admin panel' and message.chat.id == ADMIN_ID)
+@text_command('🛠 Admin panel', admin_only=True)
 def admin_panel(message):
     user_id = message.from_user.id
     set_user_state(user_id, 'in_admin_panel')
     
-    markup = ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
-    markup.add(
-        KeyboardButton('📊 Dashboard'),
-        KeyboardButton('🚀 Startuplar'),
-        KeyboardButton('👥 Foydalanuvchilar'),
-        KeyboardButton('📢 Xabar yuborish'),
-        KeyboardButton('⚙️ Sozlamalar'),
-        KeyboardButton('🔙 Orqaga')
-    )
-    
     # Welcome message with statistics
     stats = get_statistics()
     
@@ -1270,13 +1350,13 @@ def admin_panel(message):
         f"└ ✅ Yakunlangan: <b>{stats['completed_startups']}</b>"
     )
     
-    bot.send_message(message.chat.id, welcome_text, reply_markup=markup)
+    bot.send_message(message.chat.id, welcome_text, reply_markup=keyboards.ADMIN_PANEL_MENU)
 
-@bot.message_handler(func=lambda message: message.text == '📊 Dashboard' and message.chat.id == ADMIN_ID)
+@text_command('📊 Dashboard', admin_only=True)
 def admin_dashboard(message):
     stats = get_statistics()
     recent_users = get_recent_users(5)
-    recent_startups = get_recent_startups(5)
+    recent_startups = attach_owners(get_recent_startups(5))
     
     # Dashboard text
     dashboard_text = (
@@ -1306,28 +1386,12 @@ def admin_dashboard(message):
                 'completed': '✅',
                 'rejected': '❌'
             }.get(startup['status'], '❓')
-            dashboard_text += f"{i}. {startup['name']} {status_emoji}\n"
+            dashboard_text += f"{i}. {startup['name']} {status_emoji} — 👤 {format_owner_name(startup)}\n"
     
-    markup = InlineKeyboardMarkup()
-    markup.add(
-        InlineKeyboardButton('🔄 Yangilash', callback_data='refresh_dashboard'),
-        InlineKeyboardButton('📈 Toliq statistikalar', callback_data='full_stats'),
-        InlineKeyboardButton('🔙 Orqaga', callback_data='back_to_admin_panel')
-    )
-    
-    bot.send_message(message.chat.id, dashboard_text, reply_markup=markup)
+    bot.send_message(message.chat.id, dashboard_text, reply_markup=keyboards.DASHBOARD_KEYBOARD)
 
-@bot.message_handler(func=lambda message: message.text == '🚀 Startuplar' and message.chat.id == ADMIN_ID)
+@text_command('🚀 Startuplar', admin_only=True)
 def admin_startups_menu(message):
-    markup = InlineKeyboardMarkup(row_width=2)
-    markup.add(
-        InlineKeyboardButton('⏳ Kutilayotgan', callback_data='pending_startups_1'),
-        InlineKeyboardButton('▶️ Faol', callback_data='active_startups_1'),
-        InlineKeyboardButton('✅ Yakunlangan', callback_data='completed_startups_1'),
-        InlineKeyboardButton('❌ Rad etilgan', callback_data='rejected_startups_1'),
-        InlineKeyboardButton('🔙 Orqaga', callback_data='back_to_admin_panel')
-    )
-    
     stats = get_statistics()
     text = (
         f"🚀 <b>Startuplar boshqaruvi</b>\n\n"
@@ -1338,49 +1402,62 @@ def admin_startups_menu(message):
         f"└ ❌ Rad etilgan: <b>{stats['rejected_startups']}</b>"
     )
     
-    bot.send_message(message.chat.id, text, reply_markup=markup)
+    bot.send_message(message.chat.id, text, reply_markup=keyboards.ADMIN_STARTUPS_KEYBOARD)
+
+ADMIN_STARTUP_LISTS = {
+    'pending': ('⏳', 'Kutilayotgan'),
+    'active': ('▶️', 'Faol'),
+    'completed': ('✅', 'Yakunlangan'),
+    'rejected': ('❌', 'Rad etilgan')
+}
+
+def handle_admin_startups_page(call, status: str, page: int, direction: str = 'n', cursor: Optional[str] = None):
+    page, cursor, backward = keyset_page(page, direction, cursor)
+    show_admin_startups(call, status, page, cursor, backward)
+
+for _status in ADMIN_STARTUP_LISTS:
+    callback_router.add(f'{_status}_startups',
+                        lambda call, *args, status=_status: handle_admin_startups_page(call, status, *args),
+                        int, str, str)
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('pending_startups_'))
 def show_pending_startups(call):
+    show_admin_startups(call, 'pending')
+
+def show_admin_startups(call, status: str, page: int = 1, cursor: Optional[str] = None, backward: bool = False):
     if call.from_user.id != ADMIN_ID:
         bot.answer_callback_query(call.id, "❌ Ruxsat yo'q!", show_alert=True)
         return
     
-    page = int(call.data.split('_')[2])
-    startups, total = get_pending_startups(page)
+    emoji, title = ADMIN_STARTUP_LISTS[status]
+    startups, has_more = get_startups_page(status, cursor, per_page=5, backward=backward)
+    if backward and not has_more:
+        page = 1
     
     if not startups:
-        text = "⏳ <b>Kutilayotgan startuplar yo'q.</b>"
+        text = f"{emoji} <b>{title} startuplar yo'q.</b>"
         markup = InlineKeyboardMarkup()
         markup.add(InlineKeyboardButton('🔙 Orqaga', callback_data='back_to_admin_startups'))
     else:
-        total_pages = max(1, (total + 4) // 5)
-        text = f"⏳ <b>Kutilayotgan startuplar</b>\n📄 Sahifa: <b>{page}/{total_pages}</b>\n\n"
+        total_pages = max(page, (count_startups(status) + 4) // 5)
+        text = f"{emoji} <b>{title} startuplar</b>\n📄 Sahifa: <b>{page}/{total_pages}</b>\n\n"
         
         for i, startup in enumerate(startups, start=(page-1)*5+1):
-            user = get_user(startup['owner_id'])
-            owner_name = f"{user.get('first_name', '')} {user.get('last_name', '')}".strip() if user else "Noma'lum"
+            owner_name = format_owner_name(startup)
             text += f"{i}. <b>{startup['name']}</b>\n   👤 {owner_name}\n\n"
         
         markup = InlineKeyboardMarkup()
         
         # Page navigation
-        nav_buttons = []
-        if page > 1:
-            nav_buttons.append(InlineKeyboardButton('⏮️', callback_data=f'pending_startups_{page-1}'))
-        
-        nav_buttons.append(InlineKeyboardButton(f'{page}/{total_pages}', callback_data='current_page'))
-        
-        if page < total_pages:
-            nav_buttons.append(InlineKeyboardButton('⏭️', callback_data=f'pending_startups_{page+1}'))
-        
-        if nav_buttons:
-            markup.row(*nav_buttons)
+        nav_buttons = keyset_nav_buttons(f'{status}_startups', page, startups, has_more, backward,
+                                         prev_label='⏮️', next_label='⏭️')
+        nav_buttons.insert(1 if page > 1 else 0,
+                           InlineKeyboardButton(f'{page}/{total_pages}', callback_data='current_page'))
+        markup.row(*nav_buttons)
         
         # Startup selection
         for i, startup in enumerate(startups):
             markup.add(InlineKeyboardButton(f'{i+1}. {startup["name"][:20]}...', 
-                                           callback_data=f'admin_view_startup_{startup["startup_id"]}'))
+                                           callback_data=encode_callback('admin_view_startup', startup['startup_id'])))
         
         markup.add(InlineKeyboardButton('🔙 Orqaga', callback_data='back_to_admin_startups'))
     
@@ -1391,23 +1468,21 @@ def show_pending_startups(call):
     
     bot.answer_callback_query(call.id)
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('admin_view_startup_'))
-def admin_view_startup_details(call):
+@callback_router.route('admin_view_startup', int)
+def admin_view_startup_details(call, startup_id: int):
     if call.from_user.id != ADMIN_ID:
         bot.answer_callback_query(call.id, "❌ Ruxsat yo'q!", show_alert=True)
         return
     
     try:
-        startup_id = int(call.data.split('_')[3])
-        startup = get_startup(startup_id)
+        startup = get_startup_with_owner(startup_id)
         
         if not startup:
             bot.answer_callback_query(call.id, "❌ Startup topilmadi!", show_alert=True)
             return
         
-        user = get_user(startup['owner_id'])
-        owner_name = f"{user.get('first_name', '')} {user.get('last_name', '')}".strip() if user else "Noma'lum"
-        owner_contact = f"@{user.get('username', '')}" if user and user.get('username') else f"ID: {startup['owner_id']}"
+        owner_name = format_owner_name(startup)
+        owner_contact = f"@{startup['owner_username']}" if startup.get('owner_username') else f"ID: {startup['owner_id']}"
         
         text = (
             f"🖼 <b>Startup ma'lumotlari</b>\n\n"
@@ -1424,8 +1499,8 @@ def admin_view_startup_details(call):
         
         if startup['status'] == 'pending':
             markup.add(
-                InlineKeyboardButton('✅ Tasdiqlash', callback_data=f'admin_approve_{startup_id}'),
-                InlineKeyboardButton('❌ Rad etish', callback_data=f'admin_reject_{startup_id}')
+                InlineKeyboardButton('✅ Tasdiqlash', callback_data=encode_callback('admin_approve', startup_id)),
+                InlineKeyboardButton('❌ Rad etish', callback_data=encode_callback('admin_reject', startup_id))
             )
         elif startup['status'] == 'active':
             markup.add(InlineKeyboardButton('✅ Faol', callback_data='already_active'))
@@ -1434,7 +1509,7 @@ def admin_view_startup_details(call):
         elif startup['status'] == 'rejected':
             markup.add(InlineKeyboardButton('❌ Rad etilgan', callback_data='already_rejected'))
         
-        markup.add(InlineKeyboardButton('🔙 Orqaga', callback_data='pending_startups_1'))
+        markup.add(InlineKeyboardButton('🔙 Orqaga', callback_data=encode_callback(f'{startup["status"]}_startups', 1)))
         
         bot.delete_message(call.message.chat.id, call.message.message_id)
         
@@ -1448,18 +1523,17 @@ def admin_view_startup_details(call):
         logging.error(f"Admin view startup xatosi: {e}")
         bot.answer_callback_query(call.id, "⚠️ Xatolik yuz berdi!", show_alert=True)
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('admin_approve_'))
-def admin_approve_startup(call):
+@callback_router.route('admin_approve', int)
+def admin_approve_startup(call, startup_id: int):
     if call.from_user.id != ADMIN_ID:
         bot.answer_callback_query(call.id, "❌ Ruxsat yo'q!", show_alert=True)
         return
     
     try:
-        startup_id = int(call.data.split('_')[2])
         update_startup_status(startup_id, 'active')
         
         # Notify owner
-        startup = get_startup(startup_id)
+        startup = get_startup_with_owner(startup_id)
         if startup:
             try:
                 bot.send_message(
@@ -1472,8 +1546,7 @@ def admin_approve_startup(call):
         
         # Post to channel (TO'G'RILANGAN - inline tugma bilan)
         try:
-            user = get_user(startup['owner_id'])
-            owner_name = f"{user.get('first_name', '')} {user.get('last_name', '')}".strip() if user else "Noma'lum"
+            owner_name = format_owner_name(startup)
             
             channel_text = (
                 f"🚀 <b>{startup['name']}</b>\n\n"
@@ -1487,7 +1560,7 @@ def admin_approve_startup(call):
             markup = InlineKeyboardMarkup()
             # Use callback_data so pressing the button creates a join request
             markup.add(InlineKeyboardButton('🤝 Startupga qo\'shilish', 
-                                           callback_data=f'join_startup_{startup_id}'))
+                                           callback_data=encode_callback('join_startup', startup_id)))
             
             if startup.get('logo'):
                 bot.send_photo(CHANNEL_USERNAME, startup['logo'], caption=channel_text, reply_markup=markup)
@@ -1510,14 +1583,13 @@ def admin_approve_startup(call):
         logging.error(f"Admin approve xatosi: {e}")
         bot.answer_callback_query(call.id, "⚠️ Xatolik yuz berdi!", show_alert=True)
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('admin_reject_'))
-def admin_reject_startup(call):
+@callback_router.route('admin_reject', int)
+def admin_reject_startup(call, startup_id: int):
     if call.from_user.id != ADMIN_ID:
         bot.answer_callback_query(call.id, "❌ Ruxsat yo'q!", show_alert=True)
         return
     
     try:
-        startup_id = int(call.data.split('_')[2])
         update_startup_status(startup_id, 'rejected')
         
         # Notify owner
@@ -1546,7 +1618,7 @@ def admin_reject_startup(call):
         logging.error(f"Admin reject xatosi: {e}")
         bot.answer_callback_query(call.id, "⚠️ Xatolik yuz berdi!", show_alert=True)
 
-@bot.message_handler(func=lambda message: message.text == '👥 Foydalanuvchilar' and message.chat.id == ADMIN_ID)
+@text_command('👥 Foydalanuvchilar', admin_only=True)
 def admin_users(message):
     stats = get_statistics()
     recent_users = get_recent_users(10)
@@ -1562,27 +1634,20 @@ def admin_users(message):
         text += f"{i}. {user.get('first_name', '')} {user.get('last_name', '')}\n"
         text += f"   👤 @{user.get('username', '—')} | 📅 {joined_date}\n\n"
     
-    markup = InlineKeyboardMarkup()
-    markup.add(
-        InlineKeyboardButton('📥 Foydalanuvchilar ro\'yxati', callback_data='users_list_1'),
-        InlineKeyboardButton('📊 Statistika', callback_data='users_stats'),
-        InlineKeyboardButton('🔙 Orqaga', callback_data='back_to_admin_panel')
-    )
-    
-    bot.send_message(message.chat.id, text, reply_markup=markup)
+    bot.send_message(message.chat.id, text, reply_markup=keyboards.ADMIN_USERS_KEYBOARD)
 
-@bot.message_handler(func=lambda message: message.text == '📢 Xabar yuborish' and message.chat.id == ADMIN_ID)
+@text_command('📢 Xabar yuborish', admin_only=True)
 def broadcast_message_start(message):
     user_id = message.from_user.id
     set_user_state(user_id, 'broadcasting_message')
     
-    msg = bot.send_message(message.chat.id, 
-                          "📢 <b>Xabaringizni yozing:</b>\n\n"
-                          "<i>Barcha foydalanuvchilarga yuboriladi.</i>",
-                          reply_markup=create_back_button())
-    bot.register_next_step_handler(msg, process_broadcast_message)
+    bot.send_message(message.chat.id, 
+                     "📢 <b>Xabaringizni yozing:</b>\n\n"
+                     "<i>Barcha foydalanuvchilarga yuboriladi.</i>",
+                     reply_markup=create_back_button())
 
-def process_broadcast_message(message):
+@conversation_step('broadcasting_message')
+def process_broadcast_message(message, data):
     user_id = message.from_user.id
     
     if message.text == '🔙 Orqaga':
@@ -1590,32 +1655,27 @@ def process_broadcast_message(message):
         admin_panel(message)
         return
     
-    text = message.text
-    users = get_all_users()
-    
-    bot.send_message(message.chat.id, f"📤 <b>Xabar yuborilmoqda...</b>\n\nFoydalanuvchilar: {len(users)} ta")
-    
-    success = 0
-    fail = 0
-    
-    for user_id in users:
-        try:
-            bot.send_message(user_id, f"📢 <b>Yangilik!</b>\n\n{text}")
-            success += 1
-        except Exception as e:
-            fail += 1
-    
-    bot.send_message(
-        message.chat.id,
-        f"✅ <b>Xabar yuborish yakunlandi!</b>\n\n"
-        f"✅ Yuborildi: {success} ta\n"
-        f"❌ Yuborilmadi: {fail} ta"
-    )
+    # Yuborish fonda: handler darhol qaytadi, progress shu xabarda yangilanadi
+    job_id = broadcast.create_job('message', f"📢 <b>Yangilik!</b>\n\n{message.text}", admin_chat_id=message.chat.id)
+    progress = bot.send_message(message.chat.id, broadcast.format_progress(broadcast.get_job(job_id)))
+    broadcast.set_progress_message(job_id, progress.message_id)
+    broadcaster.start(job_id)
     
     clear_user_state(message.from_user.id)
     admin_panel(message)
 
-@bot.message_handler(func=lambda message: message.text == '⚙️ Sozlamalar' and message.chat.id == ADMIN_ID)
+def format_cache_stats(cache: TTLCache) -> str:
+    stats = cache.stats()
+    return f"{stats['hits']}/{stats['misses']} ({stats['size']}/{stats['maxsize']})"
+
+def format_dispatch_stats(stats: Dict) -> str:
+    return (
+        f"├ Shardlar: {stats['shards']} (navbatda: {sum(stats['depth'])}, maks: {max(stats['max_depth'])})\n"
+        f"├ Bajarildi: {stats['processed']}\n"
+        f"└ Kutilgan: {stats['blocked_puts']} marta, {stats['blocked_seconds']} s"
+    )
+
+@text_command('⚙️ Sozlamalar', admin_only=True)
 def admin_settings(message):
     text = (
         f"⚙️ <b>Admin sozlamalari</b>\n\n"
@@ -1624,36 +1684,35 @@ def admin_settings(message):
         f"├ Admin ID: {ADMIN_ID}\n"
         f"└ Kanal: {CHANNEL_USERNAME}\n\n"
         f"📊 <b>Statistikalar:</b>\n"
-        f"├ Database: garajhub.db\n"
-        f"└ Versiya: 2.0"
-    )
-    
-    markup = InlineKeyboardMarkup()
-    markup.add(
-        InlineKeyboardButton('🔄 Database yangilash', callback_data='refresh_db'),
-        InlineKeyboardButton('📊 Backup olish', callback_data='backup_db'),
-        InlineKeyboardButton('🔙 Orqaga', callback_data='back_to_admin_panel')
+        f"├ Database: {DB_PATH}\n"
+        f"└ Versiya: 2.0\n\n"
+        f"🗂 <b>Kesh (hit/miss):</b>\n"
+        f"├ Foydalanuvchilar: {format_cache_stats(user_cache)}\n"
+        f"├ Startuplar: {format_cache_stats(startup_cache)}\n"
+        f"└ Obuna: {format_cache_stats(subscription_cache)}\n\n"
+        f"🧵 <b>Navbatlar:</b>\n"
+        f"{format_dispatch_stats(bot.dispatcher.stats())}"
     )
     
-    bot.send_message(message.chat.id, text, reply_markup=markup)
+    bot.send_message(message.chat.id, text, reply_markup=keyboards.ADMIN_SETTINGS_KEYBOARD)
 
 # Callback query handlers
-@bot.callback_query_handler(func=lambda call: call.data == 'back_to_admin_panel')
+@callback_router.route('back_to_admin_panel')
 def handle_back_to_admin_panel(call):
     admin_panel(call.message)
     bot.answer_callback_query(call.id)
 
-@bot.callback_query_handler(func=lambda call: call.data == 'back_to_admin_startups')
+@callback_router.route('back_to_admin_startups')
 def handle_back_to_admin_startups(call):
     admin_startups_menu(call.message)
     bot.answer_callback_query(call.id)
 
-@bot.callback_query_handler(func=lambda call: call.data == 'refresh_dashboard')
+@callback_router.route('refresh_dashboard')
 def handle_refresh_dashboard(call):
     admin_dashboard(call.message)
     bot.answer_callback_query(call.id, "🔄 Dashboard yangilandi!")
 
-@bot.callback_query_handler(func=lambda call: call.data == 'full_stats')
+@callback_router.route('full_stats')
 def handle_full_stats(call):
     stats = get_statistics()
     bot.answer_callback_query(call.id, 
@@ -1665,20 +1724,53 @@ def handle_full_stats(call):
                              f"❌ Rad etilgan: {stats['rejected_startups']}", 
                              show_alert=True)
 
-@bot.callback_query_handler(func=lambda call: call.data == 'refresh_db')
+@callback_router.route('refresh_db')
 def handle_refresh_db(call):
     init_db()
+    storage.rebuild_counters()
     bot.answer_callback_query(call.id, "✅ Database yangilandi!")
 
-@bot.callback_query_handler(func=lambda call: call.data == 'backup_db')
+@callback_router.route('backup_db')
 def handle_backup_db(call):
     bot.answer_callback_query(call.id, "⏳ Backup tayyorlanmoqda...")
 
-@bot.callback_query_handler(func=lambda call: call.data == 'users_list_1')
-def handle_users_list(call):
-    bot.answer_callback_query(call.id, "⏳ Foydalanuvchilar ro'yxati tuzilmoqda...")
+USERS_PER_PAGE = 10
+
+@callback_router.route('users_list', int, str, str)
+def handle_users_list(call, page: int = 1, direction: str = 'n', cursor: Optional[str] = None):
+    if call.from_user.id != ADMIN_ID:
+        bot.answer_callback_query(call.id, "❌ Ruxsat yo'q!", show_alert=True)
+        return
+    
+    page, cursor, backward = keyset_page(page, direction, cursor)
+    users, has_more = storage.get_users_page('newest', decode_cursor(cursor) if cursor else None,
+                                             per_page=USERS_PER_PAGE, backward=backward)
+    if backward and not has_more:
+        page = 1
+    
+    markup = InlineKeyboardMarkup()
+    if not users:
+        text = "👥 <b>Foydalanuvchilar yo'q.</b>"
+    else:
+        total_pages = max(page, (get_statistics()['total_users'] + USERS_PER_PAGE - 1) // USERS_PER_PAGE)
+        text = f"📥 <b>Foydalanuvchilar ro'yxati</b>\n📄 Sahifa: <b>{page}/{total_pages}</b>\n\n"
+        for i, user in enumerate(users, start=(page-1)*USERS_PER_PAGE+1):
+            joined_date = user['joined_at'][:10] if user.get('joined_at') else '—'
+            username = f"@{user['username']}" if user.get('username') else f"ID: {user['user_id']}"
+            text += f"{i}. {user.get('first_name') or ''} {user.get('last_name') or ''}\n"
+            text += f"   👤 {username} | 📅 {joined_date}\n"
+        
+        nav_buttons = keyset_nav_buttons('users_list', page, users, has_more, backward,
+                                         prev_label='⏮️', next_label='⏭️', cursor_of=encode_user_cursor)
+        nav_buttons.insert(1 if page > 1 else 0,
+                           InlineKeyboardButton(f'{page}/{total_pages}', callback_data='current_page'))
+        markup.row(*nav_buttons)
+    markup.add(InlineKeyboardButton('🔙 Orqaga', callback_data='back_to_admin_panel'))
+    
+    edit_or_send(call.message, text, markup)
+    bot.answer_callback_query(call.id)
 
-@bot.callback_query_handler(func=lambda call: call.data == 'users_stats')
+@callback_router.route('users_stats')
 def handle_users_stats(call):
     stats = get_statistics()
     bot.answer_callback_query(call.id, 
@@ -1686,18 +1778,34 @@ def handle_users_stats(call):
                              f"🚀 Startuplar: {stats['total_startups']}", 
                              show_alert=True)
 
-@bot.callback_query_handler(func=lambda call: call.data == 'back_to_main_menu')
+@callback_router.route('back_to_main_menu')
 def handle_back_to_main_menu(call):
     show_main_menu(call)
     bot.answer_callback_query(call.id)
 
-@bot.callback_query_handler(func=lambda call: call.data in ['already_active', 'already_completed', 'already_rejected', 
-                                                          'rejected_info', 'waiting_approval', 'current_page'])
 def handle_info_callbacks(call):
     bot.answer_callback_query(call.id)
 
+for _action in ('already_active', 'already_completed', 'already_rejected', 'rejected_info', 'waiting_approval', 'current_page'):
+    callback_router.add(_action, handle_info_callbacks)
+
+@bot.callback_query_handler(func=lambda call: True)
+def handle_callback_query(call):
+    try:
+        route = callback_router.resolve(call.data or '')
+    except ValueError:
+        logging.warning(f"Noto'g'ri callback data: {call.data!r}")
+        bot.answer_callback_query(call.id, "⚠️ Xatolik yuz berdi!", show_alert=True)
+        return
+    if route is None:
+        # Eskirgan yoki noma'lum tugma: soat belgisini to'xtatamiz
+        bot.answer_callback_query(call.id)
+        return
+    handler, args = route
+    handler(call, *args)
+
 # Orqaga tugmasi uchun umumiy handler
-@bot.message_handler(func=lambda message: message.text == '🔙 Orqaga')
+@text_command('🔙 Orqaga')
 def handle_back_button(message):
     user_id = message.from_user.id
     user_state = get_user_state(user_id)
@@ -1715,14 +1823,13 @@ def handle_back_button(message):
         show_main_menu(message)
     
     elif user_state.startswith('completing_startup_'):
-        startup_id = int(user_state.split('_')[2])
+        startup_id = get_user_state_data(user_id)[1]['startup_id']
         clear_user_state(user_id)
         
         # Go back to startup view
-        startup = get_startup(startup_id)
+        startup = get_startup_with_owner(startup_id)
         if startup:
-            user = get_user(startup['owner_id'])
-            owner_name = f"{user.get('first_name', '')} {user.get('last_name', '')}".strip() if user else "Noma'lum"
+            owner_name = format_owner_name(startup)
             
             text = (
                 f"🎯 <b>Nomi:</b> {startup['name']}\n"
@@ -1732,13 +1839,13 @@ def handle_back_button(message):
             )
             
             markup = InlineKeyboardMarkup()
-            markup.add(InlineKeyboardButton('👥 A\'zolar', callback_data=f'view_members_{startup_id}_1'))
-            markup.add(InlineKeyboardButton('⏹️ Yakunlash', callback_data=f'complete_startup_{startup_id}'))
+            markup.add(InlineKeyboardButton('👥 A\'zolar', callback_data=encode_callback('view_members', startup_id, 1)))
+            markup.add(InlineKeyboardButton('⏹️ Yakunlash', callback_data=encode_callback('complete_startup', startup_id)))
             markup.add(InlineKeyboardButton('🔙 Orqaga', callback_data='back_to_my_startups'))
             
             bot.send_message(message.chat.id, text, reply_markup=markup)
     
-    elif user_state == 'creating_startup':
+    elif user_state.startswith('creating_startup_'):
         clear_user_state(user_id)
         show_main_menu(message)
     
@@ -1751,34 +1858,97 @@ def handle_back_button(message):
         clear_user_state(user_id)
         show_main_menu(message)
 
-# Boshqa barcha xabarlar uchun
+# Matnli xabarlar: bitta lug'at qidiruvi, topilmasa handle_other_messages
 @bot.message_handler(func=lambda message: True)
+def handle_text_message(message):
+    handler = None
+    if message.chat.id in ADMIN_IDS:
+        handler = ADMIN_TEXT_COMMANDS.get(message.text)
+    if handler is None:
+        handler = TEXT_COMMANDS.get(message.text, handle_other_messages)
+    handler(message)
+
+# Boshqa barcha xabarlar uchun
 def handle_other_messages(message):
-    if message.chat.id == ADMIN_ID and message.text != '🔙 Orqaga' and message.text != '🛠 Admin panel':
+    if message.chat.id in ADMIN_IDS and message.text != '🔙 Orqaga' and message.text != '🛠 Admin panel':
         # Admin panelda boshqa tugmalar bosilganda
         admin_panel(message)
     elif message.text != '🔙 Orqaga':
         show_main_menu(message)
 
 # Botni ishga tushirish
+# chat_member yangilanishlari faqat aniq so'ralganda keladi
+ALLOWED_UPDATES = ['message', 'callback_query', 'chat_member']
+
+# polling: getUpdates; webhook: updatelarni web server (/telegram/webhook) navbatidan oladi
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+TELEGRAM_WEBHOOK_SECRET = os.getenv('TELEGRAM_WEBHOOK_SECRET', '')
+WEBHOOK_BATCH_SIZE = int(os.getenv('WEBHOOK_BATCH_SIZE', '100'))
+# Bir nechta bot jarayoni: har biriga boshqa WEBHOOK_PARTITION (0..WEBHOOK_PARTITIONS-1) beriladi;
+# bitta chat updatelari doim bitta bo'limga tushadi, bo'limni bir vaqtda bitta jarayon o'qiydi
+WEBHOOK_PARTITIONS = int(os.getenv('WEBHOOK_PARTITIONS', '1'))
+WEBHOOK_PARTITION = int(os.getenv('WEBHOOK_PARTITION', '0'))
+WEBHOOK_QUEUE_POLL_INTERVAL = float(os.getenv('WEBHOOK_QUEUE_POLL_INTERVAL', '0.1'))
+
+def run_webhook_consumer():
+    bot.set_webhook(
+        url=f"{WEBHOOK_URL.rstrip('/')}/telegram/webhook",
+        secret_token=TELEGRAM_WEBHOOK_SECRET,
+        allowed_updates=ALLOWED_UPDATES
+    )
+    while True:
+        try:
+            claimed = storage.claim_updates(broadcast.PROCESS_ID, WEBHOOK_BATCH_SIZE,
+                                            WEBHOOK_PARTITION, WEBHOOK_PARTITIONS)
+        except Exception as e:
+            logging.error(f"Update navbatini o'qishda xatolik: {e}")
+            claimed = []
+        if not claimed:
+            time.sleep(WEBHOOK_QUEUE_POLL_INTERVAL)
+            continue
+        # Navbatdan faqat shard navbatlariga berilgandan keyin o'chiriladi; o'qib bo'lmaydigan
+        # update log qilinib tashlanadi, aks holda har band muddatidan keyin qayta olinib turadi
+        updates = []
+        for update_id, payload in claimed:
+            try:
+                updates.append(types.Update.de_json(payload))
+            except Exception as e:
+                logging.error(f"Update {update_id} o'qilmadi va tashlandi: {e!r}; payload={payload[:1000]}")
+        try:
+            bot.process_new_updates(updates)
+        except Exception as e:
+            logging.exception(f"Updatelarni navbatga berishda xatolik: {e}")
+        storage.ack_updates([update_id for update_id, _ in claimed])
+
 if __name__ == '__main__':
+    # DB_PATH env avval faqat web da hisobga olinardi; bot boshqa faylga o'tib qolsa darhol ko'rinsin
+    logging.warning(f"Database: {os.path.abspath(DB_PATH)} (manba: {storage.DB_PATH_SOURCE})")
     init_db()
+    broadcaster.resume()
     print("=" * 60)
     print("🚀 GarajHub Bot ishga tushdi...")
     print(f"👨‍💼 Admin ID: {ADMIN_ID}")
     print(f"📢 Kanal: {CHANNEL_USERNAME}")
     print(f"🤖 Bot: @{bot.get_me().username}")
+    print(f"🔌 Rejim: {BOT_MODE}")
+    print(f"🗄 Database: {os.path.abspath(DB_PATH)} ({storage.DB_PATH_SOURCE})")
     print("=" * 60)
     
-    try:
-        # Remove any existing webhook (prevents '409 Conflict' when another getUpdates/webhook is active)
+    if BOT_MODE == 'webhook':
+        if not WEBHOOK_URL or not TELEGRAM_WEBHOOK_SECRET:
+            raise SystemExit("BOT_MODE=webhook uchun WEBHOOK_URL va TELEGRAM_WEBHOOK_SECRET kerak")
+        run_webhook_consumer()
+    else:
         try:
-            bot.remove_webhook()
-        except Exception:
-            pass
+            # Remove any existing webhook (prevents '409 Conflict' when another getUpdates/webhook is active)
+            try:
+                bot.remove_webhook()
+            except Exception:
+                pass
 
-        bot.infinity_polling(timeout=60, long_polling_timeout=60)
-    except Exception as e:
-        logging.error(f"Botda xatolik: {e}")
-        print("Bot qayta ishga tushmoqda...")
-        bot.infinity_polling(timeout=60, long_polling_timeout=60)
\ No newline at end of file
+            bot.infinity_polling(timeout=60, long_polling_timeout=60, allowed_updates=ALLOWED_UPDATES)
+        except Exception as e:
+            logging.error(f"Botda xatolik: {e}")
+            print("Bot qayta ishga tushmoqda...")
+            bot.infinity_polling(timeout=60, long_polling_timeout=60, allowed_updates=ALLOWED_UPDATES)
@@ -0,0 +1,225 @@
+"""
+Suhbat (conversation) holatini saqlash.
+
+Har bir foydalanuvchi uchun joriy qadam (``state``) va wizard ma'lumotlari
+(``data``) saqlanadi. Xotira, SQLite va Redis backendlari bir xil
+interfeysga ega; SQLite/Redis bir nechta bot jarayoni orasida umumiy va
+restartdan keyin ham saqlanib qoladi.
+
+``python state_store.py`` uchala backendni (Redis uchun ``DictRedisClient``
+o'rinbosari bilan) bir xil tekshiruvdan o'tkazadi.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+# storage.py repo ildizida (bot/ va web/ uchun bitta modul)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from storage import db_pool
+
+STATE_BACKEND = os.getenv('STATE_BACKEND', 'sqlite')  # memory, sqlite, redis
+STATE_TTL = float(os.getenv('STATE_TTL', str(24 * 60 * 60)))
+REDIS_URL = os.getenv('REDIS_URL', '')
+REDIS_STATE_PREFIX = os.getenv('REDIS_STATE_PREFIX', 'garajhub:state:')
+
+
+class StateStore(ABC):
+    """Holat ombori interfeysi: ``get`` holat bo'lmasa ``('', {})`` qaytaradi."""
+
+    @abstractmethod
+    def get(self, user_id: int) -> Tuple[str, Dict]:
+        ...
+
+    @abstractmethod
+    def set(self, user_id: int, state: str, data: Optional[Dict] = None):
+        ...
+
+    @abstractmethod
+    def clear(self, user_id: int):
+        ...
+
+
+class MemoryStateStore(StateStore):
+    """Bitta jarayon uchun; restartda holatlar yo'qoladi."""
+
+    def __init__(self, ttl: float = STATE_TTL):
+        self.ttl = ttl
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Tuple[str, Dict]:
+        with self._lock:
+            entry = self._states.get(user_id)
+            if entry is None:
+                return '', {}
+            state, data, updated_at = entry
+            if time.time() - updated_at > self.ttl:
+                del self._states[user_id]
+                return '', {}
+        return state, json.loads(data)
+
+    def set(self, user_id: int, state: str, data: Optional[Dict] = None):
+        # JSON orqali saqlanadi: boshqa backendlar bilan bir xil xatti-harakat
+        with self._lock:
+            self._states[user_id] = (state, json.dumps(data or {}), time.time())
+
+    def clear(self, user_id: int):
+        with self._lock:
+            self._states.pop(user_id, None)
+
+
+class SQLiteStateStore(StateStore):
+    """``conversation_state`` jadvali; bot bazasini ishlatadigan barcha jarayonlar uchun umumiy."""
+
+    def __init__(self, ttl: float = STATE_TTL):
+        self.ttl = ttl
+
+    def get(self, user_id: int) -> Tuple[str, Dict]:
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT state, data FROM conversation_state WHERE user_id = ? AND updated_at >= ?',
+                           (user_id, time.time() - self.ttl))
+            row = cursor.fetchone()
+        if row is None:
+            return '', {}
+        return row['state'], json.loads(row['data'])
+
+    def set(self, user_id: int, state: str, data: Optional[Dict] = None):
+        with db_pool.connection() as conn:
+            conn.execute('''
+                INSERT INTO conversation_state (user_id, state, data, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    state = excluded.state, data = excluded.data, updated_at = excluded.updated_at
+            ''', (user_id, state, json.dumps(data or {}), time.time()))
+
+    def clear(self, user_id: int):
+        with db_pool.connection() as conn:
+            conn.execute('DELETE FROM conversation_state WHERE user_id = ?', (user_id,))
+
+    def purge_expired(self) -> int:
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM conversation_state WHERE updated_at < ?', (time.time() - self.ttl,))
+            return cursor.rowcount
+
+
+class RedisStateStore(StateStore):
+    """Redis (yoki ``get``/``set``/``delete`` ga ega istalgan mos mijoz); muddat ``ex`` bilan."""
+
+    def __init__(self, client, prefix: str = REDIS_STATE_PREFIX, ttl: float = STATE_TTL):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def _key(self, user_id: int) -> str:
+        return f'{self.prefix}{user_id}'
+
+    def get(self, user_id: int) -> Tuple[str, Dict]:
+        payload = self.client.get(self._key(user_id))
+        if payload is None:
+            return '', {}
+        entry = json.loads(payload)
+        return entry['state'], entry['data']
+
+    def set(self, user_id: int, state: str, data: Optional[Dict] = None):
+        self.client.set(self._key(user_id), json.dumps({'state': state, 'data': data or {}}), ex=int(self.ttl))
+
+    def clear(self, user_id: int):
+        self.client.delete(self._key(user_id))
+
+
+class DictRedisClient:
+    """Redis o'rniga lokal sinov uchun: ``RedisStateStore`` ishlatadigan get/set(ex)/delete, xotirada."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: str, value, ex: Optional[int] = None):
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    def delete(self, key: str) -> int:
+        with self._lock:
+            return 1 if self._data.pop(key, None) is not None else 0
+
+
+def create_state_store(backend: str = STATE_BACKEND) -> StateStore:
+    if backend == 'memory':
+        return MemoryStateStore()
+    if backend == 'redis':
+        if REDIS_URL == 'memory://':
+            # Lokal ishlab chiqish/sinov: Redis serverisiz
+            return RedisStateStore(DictRedisClient())
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("STATE_BACKEND=redis uchun 'redis' paketi o'rnatilmagan")
+        if not REDIS_URL:
+            raise RuntimeError("STATE_BACKEND=redis uchun REDIS_URL berilmagan")
+        return RedisStateStore(redis.Redis.from_url(REDIS_URL))
+    if backend != 'sqlite':
+        logging.warning(f"Noma'lum STATE_BACKEND={backend!r}, sqlite ishlatiladi")
+    return SQLiteStateStore()
+
+
+def check_store(store: StateStore) -> List[str]:
+    """Backend interfeys shartnomasini tekshiradi; muammolar ro'yxatini qaytaradi."""
+    problems = []
+    user_id = -int(time.time() * 1000)  # haqiqiy foydalanuvchilar bilan to'qnashmaydi
+    try:
+        if store.get(user_id) != ('', {}):
+            problems.append(f"holat bo'sh emas: {store.get(user_id)!r}")
+        store.set(user_id, 'creating_startup_name', {'name': 'Garaj', 'step': 1})
+        if store.get(user_id) != ('creating_startup_name', {'name': 'Garaj', 'step': 1}):
+            problems.append(f'set/get mos emas: {store.get(user_id)!r}')
+        store.set(user_id, 'editing_bio')
+        if store.get(user_id) != ('editing_bio', {}):
+            problems.append(f'qayta set data ni tozalamadi: {store.get(user_id)!r}')
+        store.clear(user_id)
+        if store.get(user_id) != ('', {}):
+            problems.append('clear dan keyin holat qoldi')
+    finally:
+        store.clear(user_id)
+    return problems
+
+
+if __name__ == '__main__':
+    # python state_store.py - memory, sqlite va redis (DictRedisClient) backendlari smoke tekshiruvi
+    from storage import init_db
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    failed = False
+    for name, store in (('memory', MemoryStateStore()), ('sqlite', SQLiteStateStore()),
+                        ('redis', RedisStateStore(DictRedisClient()))):
+        problems = check_store(store)
+        for problem in problems:
+            print(f"FAIL {name}: {problem}")
+        if not problems:
+            print(f"OK   {name}")
+        failed = failed or bool(problems)
+    raise SystemExit(1 if failed else 0)
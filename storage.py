@@ -0,0 +1,951 @@
+"""
+Shared storage layer for the bot and the web admin.
+
+Lives at the repository root; bot/ and web/ put the root on ``sys.path``
+and import this one module, so both services need the whole checkout.
+"""
+
+import os
+import json
+import atexit
+import logging
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+# ===== KONFIGURATSIYA =====
+def resolve_db_path() -> Tuple[str, str]:
+    """(yo'l, manba): manba qaysi qoida bazani tanlaganini bildiradi."""
+    if 'DB_PATH' in os.environ:
+        return os.environ['DB_PATH'], 'DB_PATH'
+    elif 'RAILWAY_VOLUME_MOUNT_PATH' in os.environ:
+        return os.path.join(os.environ['RAILWAY_VOLUME_MOUNT_PATH'], 'garajhub.db'), 'RAILWAY_VOLUME_MOUNT_PATH'
+    elif 'RAILWAY_STORAGE_DIR' in os.environ:
+        return os.path.join(os.environ['RAILWAY_STORAGE_DIR'], 'garajhub.db'), 'RAILWAY_STORAGE_DIR'
+    else:
+        return 'garajhub.db', 'default'
+
+def get_db_path():
+    return resolve_db_path()[0]
+
+DB_PATH, DB_PATH_SOURCE = resolve_db_path()
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '8'))
+DB_HEALTH_CHECK_INTERVAL = float(os.getenv('DB_HEALTH_CHECK_INTERVAL', '30'))
+DB_BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', '5000'))
+DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', '16384'))
+DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', str(256 * 1024 * 1024)))
+DB_SYNCHRONOUS = os.getenv('DB_SYNCHRONOUS', 'NORMAL')
+
+def apply_pragmas(conn: sqlite3.Connection):
+    """WAL: readers (web dashboard) never block the bot's writer and vice versa.
+
+    synchronous=NORMAL is durable across application crashes in WAL mode;
+    cache_size is negative so it is interpreted as KiB rather than pages.
+    """
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute(f'PRAGMA synchronous = {DB_SYNCHRONOUS}')
+    conn.execute(f'PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}')
+    conn.execute(f'PRAGMA cache_size = -{DB_CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size = {DB_MMAP_SIZE}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+
+# Database ulanishlari puli
+class ConnectionPool:
+    """Har bir worker thread uchun bitta uzoq yashovchi SQLite ulanishi.
+
+    Ulanishlar soni ``size`` bilan cheklanadi; limitga yetilganda o'lik
+    threadlarning ulanishlari yopiladi, baribir joy bo'lmasa vaqtinchalik
+    ulanish ochiladi va ishlatilgandan so'ng yopiladi.
+    """
+
+    def __init__(self, path: str, size: int = 8, health_check_interval: float = 30.0):
+        self.path = path
+        self.size = max(1, size)
+        self.health_check_interval = health_check_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: Dict[int, sqlite3.Connection] = {}
+        self._closed = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=DB_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        apply_pragmas(conn)
+        return conn
+
+    def _is_healthy(self, conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _prune_dead_threads(self):
+        alive = {t.ident for t in threading.enumerate()}
+        for ident in [i for i in self._connections if i not in alive]:
+            try:
+                self._connections.pop(ident).close()
+            except sqlite3.Error:
+                pass
+
+    def _acquire(self) -> Tuple[sqlite3.Connection, bool]:
+        """(ulanish, vaqtinchalikmi) juftligini qaytaradi."""
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            if time.monotonic() - self._local.checked_at < self.health_check_interval:
+                return conn, False
+            if self._is_healthy(conn):
+                self._local.checked_at = time.monotonic()
+                return conn, False
+            logging.warning("DB ulanishi yaroqsiz, qayta ulanilmoqda")
+            self._discard_local()
+
+        ident = threading.get_ident()
+        with self._lock:
+            if len(self._connections) >= self.size:
+                self._prune_dead_threads()
+            if len(self._connections) >= self.size:
+                return self._connect(), True
+            conn = self._connect()
+            self._connections[ident] = conn
+
+        self._local.conn = conn
+        self._local.checked_at = time.monotonic()
+        return conn, False
+
+    def reserve(self, threads: int):
+        """Uzoq yashovchi worker threadlar soniga limitni oshiradi: ular vaqtinchalik ulanishga tushmaydi."""
+        with self._lock:
+            self.size += max(0, threads)
+
+    def _discard_local(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        with self._lock:
+            self._connections.pop(threading.get_ident(), None)
+        if conn is not None:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    @contextmanager
+    def connection(self):
+        """Ulanishni beradi; blok muvaffaqiyatli tugasa commit, aks holda rollback."""
+        conn, temporary = self._acquire()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            if temporary:
+                conn.close()
+
+    def close_all(self):
+        with self._lock:
+            self._closed = True
+            for conn in self._connections.values():
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections.clear()
+
+db_pool = ConnectionPool(DB_PATH, size=DB_POOL_SIZE, health_check_interval=DB_HEALTH_CHECK_INTERVAL)
+atexit.register(db_pool.close_all)
+
+# ===== KESH =====
+class TTLCache:
+    """Thread-safe, hajmi cheklangan LRU kesh; har bir yozuv ``ttl`` soniyadan keyin eskiradi."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'size': len(self._data), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+# Database yaratish
+def init_db():
+    with db_pool.connection() as conn:
+        version = migrate(conn)
+        for problem in check_query_plans(conn):
+            logging.warning(f"Query plan regression: {problem}")
+    logging.info(f"Database initialized at: {DB_PATH} (schema v{version})")
+
+# ===== MIGRATSIYALAR =====
+def migrate(conn: sqlite3.Connection) -> int:
+    """Pending migrations are applied once, in order, inside one write transaction.
+
+    BEGIN IMMEDIATE takes the write lock before the version is read, so the
+    bot and the web process booting at the same time cannot both apply the
+    same migration.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        cursor.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version')
+        current = cursor.fetchone()[0]
+        for version, description, apply in MIGRATIONS:
+            if version <= current:
+                continue
+            logging.info(f"Applying migration {version}: {description}")
+            apply(cursor)
+            cursor.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                           (version, description))
+            current = version
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    cursor.execute('PRAGMA optimize')
+    return current
+
+def _create_schema(cursor):
+    # Foydalanuvchilar jadvali
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            first_name TEXT,
+            last_name TEXT DEFAULT '',
+            phone TEXT DEFAULT '',
+            gender TEXT DEFAULT '',
+            birth_date TEXT DEFAULT '',
+            bio TEXT DEFAULT '',
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status TEXT DEFAULT 'active'
+        )
+    ''')
+    
+    # Migrate: Add missing columns if they don't exist
+    try:
+        cursor.execute('PRAGMA table_info(users)')
+        columns = [col[1] for col in cursor.fetchall()]
+        
+        if 'last_name' not in columns:
+            cursor.execute('ALTER TABLE users ADD COLUMN last_name TEXT DEFAULT ""')
+        if 'phone' not in columns:
+            cursor.execute('ALTER TABLE users ADD COLUMN phone TEXT DEFAULT ""')
+        if 'gender' not in columns:
+            cursor.execute('ALTER TABLE users ADD COLUMN gender TEXT DEFAULT ""')
+        if 'birth_date' not in columns:
+            cursor.execute('ALTER TABLE users ADD COLUMN birth_date TEXT DEFAULT ""')
+        if 'bio' not in columns:
+            cursor.execute('ALTER TABLE users ADD COLUMN bio TEXT DEFAULT ""')
+        if 'status' not in columns:
+            cursor.execute("ALTER TABLE users ADD COLUMN status TEXT DEFAULT 'active'")
+    except Exception as e:
+        logging.warning(f"Migration warning (non-critical): {e}")
+    
+    # Startuplar jadvali
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS startups (
+            startup_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            logo TEXT,
+            group_link TEXT NOT NULL,
+            owner_id INTEGER NOT NULL,
+            status TEXT DEFAULT 'pending', -- pending, active, completed, rejected
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            ended_at TIMESTAMP,
+            results TEXT,
+            views INTEGER DEFAULT 0,
+            FOREIGN KEY (owner_id) REFERENCES users (user_id)
+        )
+    ''')
+    
+    # Migrate: Add missing columns to startups table
+    try:
+        cursor.execute('PRAGMA table_info(startups)')
+        columns = [col[1] for col in cursor.fetchall()]
+        
+        if 'logo' not in columns:
+            cursor.execute('ALTER TABLE startups ADD COLUMN logo TEXT')
+        if 'group_link' not in columns:
+            cursor.execute('ALTER TABLE startups ADD COLUMN group_link TEXT')
+        if 'started_at' not in columns:
+            cursor.execute('ALTER TABLE startups ADD COLUMN started_at TIMESTAMP')
+        if 'ended_at' not in columns:
+            cursor.execute('ALTER TABLE startups ADD COLUMN ended_at TIMESTAMP')
+        if 'results' not in columns:
+            cursor.execute('ALTER TABLE startups ADD COLUMN results TEXT')
+        if 'views' not in columns:
+            cursor.execute('ALTER TABLE startups ADD COLUMN views INTEGER DEFAULT 0')
+    except Exception as e:
+        logging.warning(f"Migration warning for startups (non-critical): {e}")
+    
+    # Startup a'zolari jadvali
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS startup_members (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            startup_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            status TEXT DEFAULT 'pending', -- pending, accepted, rejected
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (startup_id) REFERENCES startups (startup_id),
+            FOREIGN KEY (user_id) REFERENCES users (user_id),
+            UNIQUE(startup_id, user_id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS admins (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            full_name TEXT,
+            email TEXT,
+            role TEXT DEFAULT 'admin',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_login TIMESTAMP
+        )
+    ''')
+
+def _create_hot_query_indexes(cursor):
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_startups_status_created ON startups (status, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_startups_owner_created ON startups (owner_id, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_members_startup_status ON startup_members (startup_id, status)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_members_user ON startup_members (user_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_joined ON users (joined_at)')
+
+STARTUP_STATUSES = ('pending', 'active', 'completed', 'rejected')
+
+def _create_stats_counters(cursor):
+    # Bitta qatorli hisoblagichlar: get_statistics() COUNT(*) o'rniga shuni o'qiydi
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_counters (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_users INTEGER NOT NULL DEFAULT 0,
+            total_startups INTEGER NOT NULL DEFAULT 0,
+            pending_startups INTEGER NOT NULL DEFAULT 0,
+            active_startups INTEGER NOT NULL DEFAULT 0,
+            completed_startups INTEGER NOT NULL DEFAULT 0,
+            rejected_startups INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            day TEXT PRIMARY KEY,
+            new_users INTEGER NOT NULL DEFAULT 0,
+            new_startups INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    _backfill_counters(cursor)
+
+    status_deltas = ',\n'.join(
+        f"{status}_startups = {status}_startups + (NEW.status IS '{status}') - (OLD.status IS '{status}')"
+        for status in STARTUP_STATUSES
+    )
+    status_inserts = ',\n'.join(
+        f"{status}_startups = {status}_startups + (NEW.status IS '{status}')" for status in STARTUP_STATUSES
+    )
+    status_deletes = ',\n'.join(
+        f"{status}_startups = {status}_startups - (OLD.status IS '{status}')" for status in STARTUP_STATUSES
+    )
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_counters_insert AFTER INSERT ON users
+        BEGIN
+            UPDATE stats_counters SET total_users = total_users + 1 WHERE id = 1;
+            INSERT INTO daily_stats (day, new_users) VALUES (date(COALESCE(NEW.joined_at, 'now')), 1)
+            ON CONFLICT (day) DO UPDATE SET new_users = new_users + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_counters_delete AFTER DELETE ON users
+        BEGIN
+            UPDATE stats_counters SET total_users = total_users - 1 WHERE id = 1;
+            UPDATE daily_stats SET new_users = new_users - 1 WHERE day = date(OLD.joined_at);
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_startups_counters_insert AFTER INSERT ON startups
+        BEGIN
+            UPDATE stats_counters SET total_startups = total_startups + 1,
+                {status_inserts}
+            WHERE id = 1;
+            INSERT INTO daily_stats (day, new_startups) VALUES (date(COALESCE(NEW.created_at, 'now')), 1)
+            ON CONFLICT (day) DO UPDATE SET new_startups = new_startups + 1;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_startups_counters_status AFTER UPDATE OF status ON startups
+        WHEN OLD.status IS NOT NEW.status
+        BEGIN
+            UPDATE stats_counters SET
+                {status_deltas}
+            WHERE id = 1;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_startups_counters_delete AFTER DELETE ON startups
+        BEGIN
+            UPDATE stats_counters SET total_startups = total_startups - 1,
+                {status_deletes}
+            WHERE id = 1;
+            UPDATE daily_stats SET new_startups = new_startups - 1 WHERE day = date(OLD.created_at);
+        END
+    ''')
+
+def _backfill_counters(cursor):
+    status_counts = ',\n'.join(
+        f"(SELECT COUNT(*) FROM startups WHERE status = '{status}')" for status in STARTUP_STATUSES
+    )
+    cursor.execute('DELETE FROM stats_counters')
+    cursor.execute(f'''
+        INSERT INTO stats_counters (id, total_users, total_startups,
+            pending_startups, active_startups, completed_startups, rejected_startups)
+        VALUES (1, (SELECT COUNT(*) FROM users), (SELECT COUNT(*) FROM startups),
+            {status_counts})
+    ''')
+    # Qatorlar o'chirilmaydi: daily_stats da faqat trigger yozadigan ustunlar ham bor
+    cursor.execute('UPDATE daily_stats SET new_users = 0, new_startups = 0')
+    cursor.execute('''
+        INSERT INTO daily_stats (day, new_users, new_startups)
+        SELECT day, SUM(is_user), SUM(is_startup) FROM (
+            SELECT date(joined_at) AS day, 1 AS is_user, 0 AS is_startup FROM users
+            UNION ALL
+            SELECT date(created_at), 0, 1 FROM startups
+        )
+        WHERE day IS NOT NULL
+        GROUP BY day
+        ON CONFLICT (day) DO UPDATE SET new_users = excluded.new_users, new_startups = excluded.new_startups
+    ''')
+
+def _create_broadcast_tables(cursor):
+    # Ommaviy xabar ishi va har bir qabul qiluvchi holati: restartdan keyin davom ettiriladi
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS broadcast_jobs (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL DEFAULT 'message', -- message, photo
+            text TEXT,
+            photo TEXT,
+            admin_chat_id INTEGER,
+            progress_message_id INTEGER,
+            status TEXT NOT NULL DEFAULT 'running', -- running, done
+            total INTEGER NOT NULL DEFAULT 0,
+            sent INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS broadcast_recipients (
+            job_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending', -- pending, sent, failed
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            PRIMARY KEY (job_id, user_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_broadcast_recipients_status ON broadcast_recipients (job_id, status)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_broadcast_jobs_status ON broadcast_jobs (status)')
+
+def _create_conversation_state(cursor):
+    # Suhbat (wizard) holati: bir nechta bot jarayoni va restartlar orasida umumiy
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS conversation_state (
+            user_id INTEGER PRIMARY KEY,
+            state TEXT NOT NULL,
+            data TEXT NOT NULL DEFAULT '{}', -- JSON
+            updated_at REAL NOT NULL
+        )
+    ''')
+
+def _create_update_queue(cursor):
+    # Webhook rejimi: web server qabul qilgan updatelar bot jarayoni uchun navbatda
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS telegram_updates (
+            update_id INTEGER PRIMARY KEY,
+            payload TEXT NOT NULL,
+            received_at REAL NOT NULL
+        )
+    ''')
+
+# Status o'tishlari va a'zolik so'rovlari uchun kunlik ustunlar (daily_stats da)
+DAILY_ACTIVITY_COLUMNS = ('activated_startups', 'completed_startups', 'rejected_startups',
+                          'join_requests', 'accepted_members')
+
+def _create_daily_activity(cursor):
+    # Grafiklar uchun kunlik rollup: 365 kunlik grafik daily_stats dan bitta PK oraliq o'qishi
+    cursor.execute('PRAGMA table_info(daily_stats)')
+    columns = [col[1] for col in cursor.fetchall()]
+    for column in DAILY_ACTIVITY_COLUMNS:
+        if column not in columns:
+            cursor.execute(f'ALTER TABLE daily_stats ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0')
+    _backfill_daily_activity(cursor)
+
+    # Status o'zgargan kunga yoziladi; rad etish vaqti saqlanmagani uchun date('now')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_startups_daily_status AFTER UPDATE OF status ON startups
+        WHEN OLD.status IS NOT NEW.status AND NEW.status IN ('active', 'completed', 'rejected')
+        BEGIN
+            INSERT INTO daily_stats (day, activated_startups, completed_startups, rejected_startups)
+            VALUES (date('now'), NEW.status = 'active', NEW.status = 'completed', NEW.status = 'rejected')
+            ON CONFLICT (day) DO UPDATE SET
+                activated_startups = activated_startups + excluded.activated_startups,
+                completed_startups = completed_startups + excluded.completed_startups,
+                rejected_startups = rejected_startups + excluded.rejected_startups;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_members_daily_insert AFTER INSERT ON startup_members
+        BEGIN
+            INSERT INTO daily_stats (day, join_requests) VALUES (date(COALESCE(NEW.joined_at, 'now')), 1)
+            ON CONFLICT (day) DO UPDATE SET join_requests = join_requests + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_members_daily_accept AFTER UPDATE OF status ON startup_members
+        WHEN NEW.status = 'accepted' AND OLD.status IS NOT 'accepted'
+        BEGIN
+            INSERT INTO daily_stats (day, accepted_members) VALUES (date('now'), 1)
+            ON CONFLICT (day) DO UPDATE SET accepted_members = accepted_members + 1;
+        END
+    ''')
+
+# Jadvallardagi vaqtlardan qayta hisoblanadigan ustunlar; rejected_startups va accepted_members
+# uchun vaqt saqlanmagan - ular faqat triggerda yuritiladi va qayta hisoblashda tegilmaydi
+DERIVABLE_ACTIVITY_QUERIES = (
+    ('activated_startups', 'SELECT date(started_at), COUNT(*) FROM startups WHERE started_at IS NOT NULL GROUP BY 1'),
+    ('completed_startups', 'SELECT date(ended_at), COUNT(*) FROM startups WHERE ended_at IS NOT NULL GROUP BY 1'),
+    ('join_requests', 'SELECT date(joined_at), COUNT(*) FROM startup_members WHERE joined_at IS NOT NULL GROUP BY 1'),
+)
+
+def _backfill_daily_activity(cursor):
+    cursor.execute('UPDATE daily_stats SET ' + ', '.join(f'{column} = 0' for column, _ in DERIVABLE_ACTIVITY_QUERIES))
+    for column, query in DERIVABLE_ACTIVITY_QUERIES:
+        cursor.execute(f'''
+            INSERT INTO daily_stats (day, {column}) {query}
+            ON CONFLICT (day) DO UPDATE SET {column} = excluded.{column}
+        ''')
+
+def _create_change_events(cursor):
+    # O'zgarishlar lentasi: triggerlar yozadi, web server bitta producer bilan o'qib WebSocket ga tarqatadi
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_events (
+            event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL, -- user_joined, startup_created, startup_status
+            entity_id INTEGER NOT NULL,
+            payload TEXT NOT NULL DEFAULT '{}', -- JSON
+            created_at REAL NOT NULL DEFAULT ((julianday('now') - 2440587.5) * 86400.0)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_event_insert AFTER INSERT ON users
+        BEGIN
+            INSERT INTO change_events (kind, entity_id, payload)
+            VALUES ('user_joined', NEW.user_id,
+                    json_object('username', NEW.username, 'first_name', NEW.first_name));
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_startups_event_insert AFTER INSERT ON startups
+        BEGIN
+            INSERT INTO change_events (kind, entity_id, payload)
+            VALUES ('startup_created', NEW.startup_id,
+                    json_object('name', NEW.name, 'owner_id', NEW.owner_id, 'status', NEW.status));
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_startups_event_status AFTER UPDATE OF status ON startups
+        WHEN OLD.status IS NOT NEW.status
+        BEGIN
+            INSERT INTO change_events (kind, entity_id, payload)
+            VALUES ('startup_status', NEW.startup_id,
+                    json_object('name', NEW.name, 'old_status', OLD.status, 'status', NEW.status));
+        END
+    ''')
+
+def _create_user_listing_indexes(cursor):
+    # Foydalanuvchilar ro'yxati ism bo'yicha saralanganda (get_users_page) ishlatiladi
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_name ON users (ifnull(first_name, ''))")
+
+def _add_broadcast_leases(cursor):
+    # Bir nechta bot jarayoni: ishni faqat lease egasi yuboradi; qabul qiluvchi status'i endi
+    # pending -> sending (partiya band qilingan) -> sent/failed
+    cursor.execute('PRAGMA table_info(broadcast_jobs)')
+    columns = [col[1] for col in cursor.fetchall()]
+    if 'lease_owner' not in columns:
+        cursor.execute('ALTER TABLE broadcast_jobs ADD COLUMN lease_owner TEXT')
+    if 'lease_expires' not in columns:
+        cursor.execute('ALTER TABLE broadcast_jobs ADD COLUMN lease_expires REAL')
+
+def _add_update_claims(cursor):
+    # Update bot jarayoni band qilganda belgilanadi, handlerga berilgach o'chiriladi (ack_updates)
+    cursor.execute('PRAGMA table_info(telegram_updates)')
+    if 'claimed_until' not in [col[1] for col in cursor.fetchall()]:
+        cursor.execute('ALTER TABLE telegram_updates ADD COLUMN claimed_until REAL')
+
+# Navbat kaliti dispatch.update_shard_key bilan bir xil: xabarlar chat, callbacklar foydalanuvchi bo'yicha
+UPDATE_SHARD_KEY_SQL = '''COALESCE(
+    json_extract({payload}, '$.message.chat.id'),
+    json_extract({payload}, '$.edited_message.chat.id'),
+    json_extract({payload}, '$.callback_query.from.id'),
+    json_extract({payload}, '$.chat_member.chat.id'),
+    json_extract({payload}, '$.my_chat_member.chat.id'),
+    {update_id}
+)'''
+
+def _add_update_partitions(cursor):
+    # Bir nechta bot jarayoni: navbat shard_key bo'yicha bo'limlarga bo'linadi, har bo'lim bitta jarayonda
+    cursor.execute('PRAGMA table_info(telegram_updates)')
+    if 'shard_key' not in [col[1] for col in cursor.fetchall()]:
+        cursor.execute('ALTER TABLE telegram_updates ADD COLUMN shard_key INTEGER')
+    shard_key = UPDATE_SHARD_KEY_SQL.format(payload='payload', update_id='update_id')
+    cursor.execute(f'UPDATE telegram_updates SET shard_key = {shard_key} WHERE shard_key IS NULL')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS webhook_consumers (
+            partition INTEGER PRIMARY KEY,
+            owner TEXT NOT NULL,
+            lease_expires REAL NOT NULL
+        )
+    ''')
+
+# (version, description, apply) - append only, never renumber
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, 'base schema', _create_schema),
+    (2, 'indexes for hot queries', _create_hot_query_indexes),
+    (3, 'trigger-maintained statistics counters', _create_stats_counters),
+    (4, 'broadcast jobs', _create_broadcast_tables),
+    (5, 'conversation state', _create_conversation_state),
+    (6, 'webhook update queue', _create_update_queue),
+    (7, 'daily activity rollups', _create_daily_activity),
+    (8, 'change events feed', _create_change_events),
+    (9, 'user listing indexes', _create_user_listing_indexes),
+    (10, 'broadcast job leases', _add_broadcast_leases),
+    (11, 'webhook update claims', _add_update_claims),
+    (12, 'webhook update partitions', _add_update_partitions),
+]
+
+# ===== STATISTIKA =====
+def get_statistics() -> Dict:
+    """Trigger bilan yangilanadigan hisoblagichlardan bitta qatorli o'qish."""
+    with db_pool.connection() as conn:
+        row = conn.execute('''
+            SELECT c.*, COALESCE(d.new_users, 0) AS new_users_today,
+                   COALESCE(d.new_startups, 0) AS new_startups_today
+            FROM stats_counters c
+            LEFT JOIN daily_stats d ON d.day = date('now')
+            WHERE c.id = 1
+        ''').fetchone()
+    stats = dict(row)
+    del stats['id']
+    return stats
+
+def rebuild_counters():
+    """Hisoblagichlarni jadvallardan qayta hisoblaydi (qo'lda tuzatish uchun)."""
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        _backfill_counters(cursor)
+        _backfill_daily_activity(cursor)
+
+TIMESERIES_BUCKETS = ('day', 'week', 'month')
+TIMESERIES_COLUMNS = ('new_users', 'new_startups') + DAILY_ACTIVITY_COLUMNS
+
+def _bucket_start(day: date, bucket: str) -> date:
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+def get_timeseries(start: date, end: date, bucket: str = 'day') -> List[Dict]:
+    """[start, end] oralig'i uchun daily_stats yig'indilari; bo'sh bucketlar 0 bilan to'ldiriladi.
+
+    Haftalar dushanbadan boshlanadi; har bir bucket ``bucket`` (YYYY-MM-DD) kaliti bilan qaytadi.
+    """
+    if bucket not in TIMESERIES_BUCKETS:
+        raise ValueError(f"Noma'lum bucket: {bucket}")
+    with db_pool.connection() as conn:
+        rows = conn.execute(f'''
+            SELECT day, {', '.join(TIMESERIES_COLUMNS)} FROM daily_stats
+            WHERE day BETWEEN ? AND ?
+        ''', (start.isoformat(), end.isoformat())).fetchall()
+
+    series: 'OrderedDict[str, Dict]' = OrderedDict()
+    day = start
+    while day <= end:
+        key = _bucket_start(day, bucket).isoformat()
+        if key not in series:
+            series[key] = dict({'bucket': key}, **{column: 0 for column in TIMESERIES_COLUMNS})
+        day += timedelta(days=1)
+    for row in rows:
+        point = series[_bucket_start(date.fromisoformat(row['day']), bucket).isoformat()]
+        for column in TIMESERIES_COLUMNS:
+            point[column] += row[column]
+    return list(series.values())
+
+# ===== FOYDALANUVCHILAR RO'YXATI =====
+# sort -> (indeksdagi kalit ifodasi, kamayish tartibidami); ikkinchi kalit doim user_id
+USER_SORTS = {
+    'newest': ('joined_at', True),
+    'oldest': ('joined_at', False),
+    'name': ("ifnull(first_name, '')", False),
+}
+
+def user_sort_key(user: Dict, sort: str) -> Tuple[Any, int]:
+    """Kursor uchun (kalit, user_id); ``get_users_page(after=...)`` ga beriladi."""
+    if sort == 'name':
+        return user.get('first_name') or '', user['user_id']
+    return user['joined_at'], user['user_id']
+
+def get_users_page(sort: str = 'newest', after: Optional[Tuple[Any, int]] = None, per_page: int = 20,
+                   backward: bool = False, status: Optional[str] = None, joined_from: Optional[str] = None,
+                   joined_to: Optional[str] = None, has_phone: Optional[bool] = None,
+                   owns_startups: Optional[bool] = None) -> Tuple[List[Dict], bool]:
+    """(foydalanuvchilar, shu yo'nalishda yana sahifa bormi) - keyset pagination, OFFSETsiz.
+
+    ``after`` - oldingi sahifa chekkasidagi ``user_sort_key``; backward=True undan oldingi sahifa.
+    ``joined_from`` kiritiladi, ``joined_to`` kiritilmaydi ('YYYY-MM-DD' yoki to'liq vaqt).
+    """
+    key, descending = USER_SORTS[sort]
+    where, params = [], []
+    if status:
+        where.append('status = ?')
+        params.append(status)
+    if joined_from:
+        where.append('joined_at >= ?')
+        params.append(joined_from)
+    if joined_to:
+        where.append('joined_at < ?')
+        params.append(joined_to)
+    if has_phone is not None:
+        where.append("ifnull(phone, '') != ''" if has_phone else "ifnull(phone, '') = ''")
+    if owns_startups is not None:
+        where.append(('' if owns_startups else 'NOT ') +
+                     'EXISTS (SELECT 1 FROM startups s WHERE s.owner_id = users.user_id)')
+    reverse = descending != backward
+    if after:
+        where.append(f"({key}, user_id) {'<' if reverse else '>'} (?, ?)")
+        params.extend(after)
+    order = 'DESC' if reverse else 'ASC'
+    query = 'SELECT * FROM users'
+    if where:
+        query += ' WHERE ' + ' AND '.join(where)
+    query += f' ORDER BY {key} {order}, user_id {order} LIMIT ?'
+    params.append(per_page + 1)
+
+    with db_pool.connection() as conn:
+        users = [dict(row) for row in conn.execute(query, params).fetchall()]
+    has_more = len(users) > per_page
+    users = users[:per_page]
+    if backward:
+        users.reverse()
+    return users, has_more
+
+# ===== EKSPORT =====
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))
+EXPORT_QUERIES = {
+    'users': '''
+        SELECT user_id, username, first_name, last_name, phone, gender, birth_date, bio, joined_at, status
+        FROM users ORDER BY user_id
+    ''',
+    'startups': '''
+        SELECT startup_id, name, description, logo, group_link, owner_id, status,
+               created_at, started_at, ended_at, results, views
+        FROM startups ORDER BY startup_id
+    ''',
+    'members': 'SELECT id, startup_id, user_id, status, joined_at FROM startup_members ORDER BY id',
+}
+
+def iter_export(table: str, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[List]:
+    """Avval ustun nomlari, keyin ``fetchmany`` partiyalari; xotira jadval hajmiga bog'liq emas.
+
+    Alohida read-only ulanish ishlatiladi: WAL da o'quvchi yozuvchini bloklamaydi,
+    SELECT esa boshidan oxirigacha bitta snapshotni ko'radi.
+    """
+    query = EXPORT_QUERIES[table]
+    conn = sqlite3.connect(f'file:{DB_PATH}?mode=ro', uri=True, timeout=DB_BUSY_TIMEOUT_MS / 1000,
+                           check_same_thread=False)
+    try:
+        cursor = conn.execute(query)
+        yield [column[0] for column in cursor.description]
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+    finally:
+        conn.close()
+
+# ===== O'ZGARISHLAR LENTASI =====
+def get_last_event_id() -> int:
+    with db_pool.connection() as conn:
+        return conn.execute('SELECT COALESCE(MAX(event_id), 0) FROM change_events').fetchone()[0]
+
+def get_events_since(event_id: int, limit: int = 500) -> List[Dict]:
+    """``event_id`` dan keyingi hodisalar, tartib bilan; payload dict ga o'giriladi."""
+    with db_pool.connection() as conn:
+        rows = conn.execute('''
+            SELECT event_id, kind, entity_id, payload, created_at FROM change_events
+            WHERE event_id > ? ORDER BY event_id LIMIT ?
+        ''', (event_id, limit)).fetchall()
+    return [dict(row, payload=json.loads(row['payload'])) for row in rows]
+
+def purge_events(max_age: float) -> int:
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM change_events WHERE created_at < ?', (time.time() - max_age,))
+        return cursor.rowcount
+
+# ===== WEBHOOK UPDATE NAVBATI =====
+def enqueue_update(update_id: int, payload: str) -> bool:
+    """Updateni navbatga qo'shadi; Telegram qayta yuborgan takror update e'tiborsiz qoldiriladi."""
+    shard_key = UPDATE_SHARD_KEY_SQL.format(payload=':payload', update_id=':update_id')
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO telegram_updates (update_id, payload, received_at, shard_key)
+            VALUES (:update_id, :payload, :received_at, {shard_key})
+        ''', {'update_id': update_id, 'payload': payload, 'received_at': time.time()})
+        return cursor.rowcount == 1
+
+UPDATE_CLAIM_TTL = float(os.getenv('UPDATE_CLAIM_TTL', '60'))
+
+def claim_updates(owner: str, limit: int = 100, partition: int = 0, partitions: int = 1,
+                  claim_ttl: float = UPDATE_CLAIM_TTL) -> List[Tuple[int, str]]:
+    """Shu bo'limdagi (``abs(shard_key) % partitions == partition``) eng eski updatelarni band qiladi.
+
+    Har bir bo'limni bir vaqtda faqat bitta jarayon (``owner``) o'qiydi - bo'lim lease i
+    ``webhook_consumers`` da; shuning uchun bitta chat updatelari ikki jarayonga bo'linmaydi.
+    Navbat bo'sh bo'lsa yozish qulfi olinmaydi. Updatelar ``ack_updates`` gacha navbatda qoladi;
+    jarayon undan oldin to'xtasa, band muddati o'tgach bo'limning yangi egasi ularni oladi.
+    """
+    mine = 'abs(shard_key) % ? = ? AND (claimed_until IS NULL OR claimed_until < ?)'
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT 1 FROM telegram_updates WHERE {mine} LIMIT 1', (partitions, partition, time.time()))
+        if cursor.fetchone() is None:
+            return []
+        cursor.execute('BEGIN IMMEDIATE')
+        now = time.time()
+        cursor.execute('''
+            INSERT INTO webhook_consumers (partition, owner, lease_expires) VALUES (?, ?, ?)
+            ON CONFLICT (partition) DO UPDATE SET owner = excluded.owner, lease_expires = excluded.lease_expires
+            WHERE webhook_consumers.owner = excluded.owner OR webhook_consumers.lease_expires < ?
+        ''', (partition, owner, now + claim_ttl, now))
+        if cursor.rowcount != 1:
+            # Bo'lim boshqa tirik jarayonda
+            return []
+        cursor.execute(f'''
+            SELECT update_id, payload FROM telegram_updates
+            WHERE {mine}
+            ORDER BY update_id LIMIT ?
+        ''', (partitions, partition, now, limit))
+        rows = cursor.fetchall()
+        cursor.executemany('UPDATE telegram_updates SET claimed_until = ? WHERE update_id = ?',
+                           [(now + claim_ttl, row['update_id']) for row in rows])
+    return [(row['update_id'], row['payload']) for row in rows]
+
+def ack_updates(update_ids: List[int]):
+    """Handlerga berilgan updatelarni navbatdan o'chiradi."""
+    with db_pool.connection() as conn:
+        conn.executemany('DELETE FROM telegram_updates WHERE update_id = ?', [(update_id,) for update_id in update_ids])
+
+# ===== QUERY PLAN TEKSHIRUVI =====
+# (query, params, index the plan must use)
+HOT_QUERY_PLANS = [
+    ("SELECT * FROM startups WHERE status = 'active' ORDER BY created_at DESC LIMIT ? OFFSET ?",
+     (10, 0), 'idx_startups_status_created'),
+    ("SELECT * FROM startups WHERE status = 'active' AND (created_at, startup_id) < (?, ?) "
+     "ORDER BY created_at DESC, startup_id DESC LIMIT ?",
+     ('2024-01-01 00:00:00', 1, 6), 'idx_startups_status_created'),
+    ("SELECT startup_id FROM startups WHERE status = 'active' ORDER BY created_at DESC, startup_id DESC",
+     (), 'idx_startups_status_created'),
+    ("SELECT startup_id, name, status FROM startups WHERE owner_id = ? "
+     "ORDER BY created_at DESC, startup_id DESC LIMIT ? OFFSET ?",
+     (1, 5, 0), 'idx_startups_owner_created'),
+    ("SELECT COUNT(*) FROM startups WHERE owner_id = ?",
+     (1,), 'idx_startups_owner_created'),
+    ("SELECT COUNT(*) FROM startup_members WHERE startup_id = ? AND status = 'accepted'",
+     (1,), 'idx_members_startup_status'),
+    ("SELECT u.* FROM users u JOIN startup_members sm ON u.user_id = sm.user_id "
+     "WHERE sm.startup_id = ? AND sm.status = 'accepted' LIMIT ? OFFSET ?",
+     (1, 5, 0), 'idx_members_startup_status'),
+    ("SELECT startup_id FROM startup_members WHERE user_id = ?",
+     (1,), 'idx_members_user'),
+    ("SELECT * FROM users ORDER BY joined_at DESC LIMIT ?",
+     (10,), 'idx_users_joined'),
+    ("SELECT * FROM users WHERE (joined_at, user_id) < (?, ?) ORDER BY joined_at DESC, user_id DESC LIMIT ?",
+     ('2024-01-01 00:00:00', 1, 21), 'idx_users_joined'),
+    ("SELECT * FROM users WHERE (ifnull(first_name, ''), user_id) > (?, ?) "
+     "ORDER BY ifnull(first_name, '') ASC, user_id ASC LIMIT ?",
+     ('A', 1, 21), 'idx_users_name'),
+    ("SELECT * FROM daily_stats WHERE day BETWEEN ? AND ?",
+     ('2024-01-01', '2024-12-31'), 'sqlite_autoindex_daily_stats_1'),
+]
+
+def check_query_plans(conn: sqlite3.Connection) -> List[str]:
+    """Returns one message per hot query whose EXPLAIN QUERY PLAN misses its index."""
+    problems = []
+    for query, params, index in HOT_QUERY_PLANS:
+        plan = ' | '.join(row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {query}', params))
+        if index not in plan:
+            problems.append(f"{query!r} does not use {index}: {plan}")
+    return problems
+
+if __name__ == '__main__':
+    # python storage.py - migratsiya + query plan assertionlari (CI/deploydan oldin)
+    logging.basicConfig(level=logging.INFO)
+    with db_pool.connection() as conn:
+        migrate(conn)
+        problems = check_query_plans(conn)
+    for problem in problems:
+        print(f"FAIL {problem}")
+    raise SystemExit(1 if problems else 0)
@@ -4,22 +4,38 @@ Copy of root server.py for web project
 
 # Original server.py content copied from project root
 
+import io
 import os
+import sys
+import csv
 import json
-import sqlite3
+import zlib
 import asyncio
 import hashlib
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+import hmac
+import base64
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from functools import partial
+from typing import Dict, List, Optional, Any, Callable, Set
 from pathlib import Path
 
 # FastAPI
-from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request, BackgroundTasks, WebSocket, WebSocketDisconnect, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, HTMLResponse, FileResponse
+from fastapi.responses import JSONResponse, HTMLResponse, FileResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 
+# storage.py repo ildizida (bot/ va web/ uchun bitta modul)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import storage
+from storage import DB_PATH, DB_POOL_SIZE, db_pool, TTLCache
+
 # Telegram bot
 try:
     import telebot
@@ -35,78 +51,37 @@ CHANNEL_USERNAME = os.getenv('CHANNEL_USERNAME', '@GarajHub_uz')
 ADMIN_ID = int(os.getenv('ADMIN_ID', '0'))
 SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-change-this-in-production')
 PORT = int(os.getenv('PORT', '8000'))
+# Webhook rejimi: setWebhook dagi secret_token bilan bir xil bo'lishi kerak
+TELEGRAM_WEBHOOK_SECRET = os.getenv('TELEGRAM_WEBHOOK_SECRET', '')
+# SQLite chaqiruvlari event loopni bloklamasligi uchun alohida thread pool'da bajariladi
+WEB_DB_THREADS = int(os.getenv('WEB_DB_THREADS', str(DB_POOL_SIZE)))
+WEB_DB_CONCURRENCY = int(os.getenv('WEB_DB_CONCURRENCY', str(WEB_DB_THREADS)))
+# /api/statistics javobi shuncha soniya keshlanadi (brauzer ham shu muddatda qayta so'ramaydi)
+STATS_CACHE_TTL = float(os.getenv('STATS_CACHE_TTL', '5'))
+# /api/timeseries bitta so'rovda qaytaradigan eng uzun oraliq (kun)
+TIMESERIES_MAX_DAYS = int(os.getenv('TIMESERIES_MAX_DAYS', str(3 * 366)))
+# /ws jonli dashboard: lenta so'rash oralig'i, hodisalar saqlanish muddati (token - ADMIN_API_TOKEN)
+WS_POLL_INTERVAL = float(os.getenv('WS_POLL_INTERVAL', '1'))
+WS_EVENT_RETENTION = float(os.getenv('WS_EVENT_RETENTION', str(24 * 60 * 60)))
+WS_CLIENT_QUEUE_SIZE = int(os.getenv('WS_CLIENT_QUEUE_SIZE', '100'))
+WS_EVENT_BATCH = 500
+# Shaxsiy ma'lumot qaytaradigan endpointlar "Authorization: Bearer <token>" talab qiladi;
+# token berilmagan bo'lsa ular yopiq (503)
+ADMIN_API_TOKEN = os.getenv('ADMIN_API_TOKEN', '')
+USERS_PAGE_MAX = 100
+START_TIME = datetime.now()
 
-# ===== DATABASE =====
-def get_db_path():
-    if 'RAILWAY_VOLUME_MOUNT_PATH' in os.environ:
-        return os.path.join(os.environ['RAILWAY_VOLUME_MOUNT_PATH'], 'garajhub.db')
-    elif 'RAILWAY_STORAGE_DIR' in os.environ:
-        return os.path.join(os.environ['RAILWAY_STORAGE_DIR'], 'garajhub.db')
-    else:
-        return 'garajhub.db'
-
-DB_PATH = get_db_path()
+def get_uptime():
+    return str(timedelta(seconds=int((datetime.now() - START_TIME).total_seconds())))
 
+# ===== DATABASE =====
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            user_id INTEGER PRIMARY KEY,
-            username TEXT,
-            first_name TEXT,
-            last_name TEXT DEFAULT '',
-            phone TEXT DEFAULT '',
-            gender TEXT DEFAULT '',
-            birth_date TEXT DEFAULT '',
-            bio TEXT DEFAULT '',
-            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            status TEXT DEFAULT 'active'
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS admins (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            full_name TEXT,
-            email TEXT,
-            role TEXT DEFAULT 'admin',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_login TIMESTAMP
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS startups (
-            startup_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            description TEXT,
-            logo TEXT,
-            group_link TEXT NOT NULL,
-            owner_id INTEGER NOT NULL,
-            status TEXT DEFAULT 'pending',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            started_at TIMESTAMP,
-            ended_at TIMESTAMP,
-            results TEXT,
-            views INTEGER DEFAULT 0
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS startup_members (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            startup_id INTEGER NOT NULL,
-            user_id INTEGER NOT NULL,
-            status TEXT DEFAULT 'pending',
-            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(startup_id, user_id)
-        )
-    ''')
-    
+    storage.init_db()
+    with db_pool.connection() as conn:
+        _init_admins(conn.cursor())
+    print(f"Database initialized at: {DB_PATH}")
+
+def _init_admins(cursor):
     cursor.execute('SELECT * FROM admins WHERE username = ?', ('admin',))
     if not cursor.fetchone():
         import hashlib
@@ -115,10 +90,164 @@ def init_db():
             INSERT INTO admins (username, password, full_name, email, role)
             VALUES (?, ?, ?, ?, ?)
         ''', ('admin', hashed_password, 'Administrator', 'admin@garajhub.uz', 'superadmin'))
-    
-    conn.commit()
-    conn.close()
-    print(f"Database initialized at: {DB_PATH}")
+
+# ===== ASYNC DATABASE =====
+db_executor = ThreadPoolExecutor(max_workers=WEB_DB_THREADS, thread_name_prefix='web-db')
+_db_semaphore: Optional[asyncio.Semaphore] = None
+
+async def run_db(func: Callable, *args, **kwargs):
+    """Sinxron storage funksiyasini ``db_executor`` da bajaradi; bir vaqtda WEB_DB_CONCURRENCY tadan ko'p emas."""
+    global _db_semaphore
+    if _db_semaphore is None:
+        _db_semaphore = asyncio.Semaphore(WEB_DB_CONCURRENCY)
+    async with _db_semaphore:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(db_executor, partial(func, *args, **kwargs))
+
+# ===== STATISTIKA KESHI =====
+stats_cache = TTLCache(maxsize=1, ttl=STATS_CACHE_TTL)
+
+async def get_cached_statistics():
+    """(statistika, ETag); ETag hisoblagichlardan olinadi, uptime kirmaydi."""
+    cached = stats_cache.get('statistics')
+    if cached is None:
+        stats = await run_db(storage.get_statistics)
+        data = {
+            "total_users": stats['total_users'],
+            "total_startups": stats['total_startups'],
+            "active_startups": stats['active_startups'],
+            "pending_startups": stats['pending_startups'],
+            "new_users_today": stats['new_users_today'],
+            "new_startups_today": stats['new_startups_today'],
+        }
+        etag = '"%s"' % hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
+        cached = (data, etag)
+        stats_cache.set('statistics', cached)
+    return cached
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("If-None-Match", "")
+    return any(tag.strip() in (etag, f"W/{etag}", "*") for tag in if_none_match.split(","))
+
+# ===== ADMIN API =====
+def require_admin_token(request: Request):
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(status_code=503, detail="ADMIN_API_TOKEN is not configured")
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token, ADMIN_API_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+def encode_page_cursor(sort: str, key: tuple) -> str:
+    raw = json.dumps([sort, *key], ensure_ascii=False).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_page_cursor(cursor: str, sort: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, key, user_id = json.loads(raw)
+        if cursor_sort != sort:
+            raise ValueError(cursor_sort)
+        return key, int(user_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# ===== JONLI DASHBOARD (WebSocket) =====
+def stats_deltas(events: List[Dict]) -> Dict[str, int]:
+    """Hodisalardan statistika o'zgarishlari, /api/statistics kalitlari bilan."""
+    deltas: Dict[str, int] = {}
+    def add(key, value):
+        deltas[key] = deltas.get(key, 0) + value
+    for event in events:
+        payload = event['payload']
+        if event['kind'] == 'user_joined':
+            add('total_users', 1)
+            add('new_users_today', 1)
+        elif event['kind'] == 'startup_created':
+            add('total_startups', 1)
+            add('new_startups_today', 1)
+            add(f"{payload['status']}_startups", 1)
+        elif event['kind'] == 'startup_status':
+            add(f"{payload['old_status']}_startups", -1)
+            add(f"{payload['status']}_startups", 1)
+    return {key: value for key, value in deltas.items() if value}
+
+class LiveFeed:
+    """Bitta producer ``change_events`` ni so'raydi va xabarni har bir ulangan mijoz navbatiga qo'yadi."""
+
+    def __init__(self):
+        self.clients: Set[asyncio.Queue] = set()
+        self.last_event_id = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=WS_CLIENT_QUEUE_SIZE)
+        self.clients.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.clients.discard(queue)
+
+    def publish(self, message: str):
+        for queue in list(self.clients):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Sekin mijoz: uziladi, qayta ulanganda yangi snapshot oladi
+                self.unsubscribe(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def start(self):
+        self.last_event_id = await run_db(storage.get_last_event_id)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        last_purge = 0.0
+        while True:
+            try:
+                if time.monotonic() - last_purge > 3600:
+                    await run_db(storage.purge_events, WS_EVENT_RETENTION)
+                    last_purge = time.monotonic()
+                events = await run_db(storage.get_events_since, self.last_event_id, WS_EVENT_BATCH)
+                if events:
+                    self.last_event_id = events[-1]['event_id']
+                    stats_cache.pop('statistics')
+                    if self.clients:
+                        self.publish(await self._message(events))
+                    if len(events) == WS_EVENT_BATCH:
+                        continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Live feed error: {e}")
+            await asyncio.sleep(WS_POLL_INTERVAL)
+
+    async def _message(self, events: List[Dict]) -> str:
+        data, _ = await get_cached_statistics()
+        return json.dumps({
+            "type": "update",
+            "last_event_id": self.last_event_id,
+            "deltas": stats_deltas(events),
+            "stats": data,
+            "pending_startups": [
+                {"startup_id": event['entity_id'], "name": event['payload']['name'],
+                 "owner_id": event['payload'].get('owner_id')}
+                for event in events
+                if event['kind'] in ('startup_created', 'startup_status') and event['payload']['status'] == 'pending'
+            ],
+            "events": events
+        }, ensure_ascii=False)
+
+live_feed = LiveFeed()
 
 # BOT_AVAILABLE and bot remain for compatibility but polling should run from bot project
 if BOT_AVAILABLE:
@@ -167,11 +296,17 @@ async def startup_event():
     print(f"Database: {DB_PATH}")
     print("=" * 60)
     try:
-        ensure_db()
+        await run_db(ensure_db)
         print("Database ready")
+        await live_feed.start()
     except Exception as e:
         print(f"Database init warning: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await live_feed.stop()
+    db_executor.shutdown(wait=True)
+
 @app.get("/")
 async def root():
     return {
@@ -183,7 +318,10 @@ async def root():
             "health": "/health",
             "admin": "/admin",
             "api_docs": "/docs",
-            "statistics": "/api/statistics"
+            "statistics": "/api/statistics",
+            "timeseries": "/api/timeseries",
+            "users": "/api/users",
+            "export": "/api/export/{users,startups,members}"
         },
         "timestamp": datetime.now().isoformat()
     }
@@ -198,48 +336,184 @@ async def health_check():
     }
 
 @app.get("/api/statistics")
-async def get_statistics():
+async def get_statistics(request: Request):
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT COUNT(*) FROM users')
-        total_users = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM startups')
-        total_startups = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM startups WHERE status = "active"')
-        active_startups = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM startups WHERE status = "pending"')
-        pending_startups = cursor.fetchone()[0]
-        
-        today = datetime.now().strftime('%Y-%m-%d')
-        cursor.execute('SELECT COUNT(*) FROM users WHERE date(joined_at) = ?', (today,))
-        new_users_today = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM startups WHERE date(created_at) = ?', (today,))
-        new_startups_today = cursor.fetchone()[0]
-        
-        conn.close()
+        data, etag = await get_cached_statistics()
+        headers = {
+            "ETag": etag,
+            "Cache-Control": f"private, max-age={int(STATS_CACHE_TTL)}, must-revalidate",
+        }
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
         
-        return {
+        return JSONResponse({
             "success": True,
-            "data": {
-                "total_users": total_users,
-                "total_startups": total_startups,
-                "active_startups": active_startups,
-                "pending_startups": pending_startups,
-                "new_users_today": new_users_today,
-                "new_startups_today": new_startups_today,
-                "uptime": get_uptime() # type: ignore
-            }
-        }
+            "data": {**data, "uptime": get_uptime()}
+        }, headers=headers)
     except Exception as e:
         return {
             "success": False,
             "error": str(e)
         }
 
+@app.get("/api/timeseries")
+async def get_timeseries(bucket: str = "day", days: int = 30, start: Optional[str] = None,
+                         end: Optional[str] = None):
+    # Oraliq: start..end (YYYY-MM-DD) yoki end dan oldingi ``days`` kun; end standart - bugun (UTC)
+    if bucket not in storage.TIMESERIES_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {', '.join(storage.TIMESERIES_BUCKETS)}")
+    try:
+        end_day = date.fromisoformat(end) if end else datetime.utcnow().date()
+        start_day = date.fromisoformat(start) if start else end_day - timedelta(days=days - 1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start and end must be YYYY-MM-DD")
+    if start_day > end_day or (end_day - start_day).days >= TIMESERIES_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range must be 1..{TIMESERIES_MAX_DAYS} days")
+    
+    series = await run_db(storage.get_timeseries, start_day, end_day, bucket)
+    return {
+        "success": True,
+        "bucket": bucket,
+        "start": start_day.isoformat(),
+        "end": end_day.isoformat(),
+        "data": series
+    }
+
+@app.get("/api/users", dependencies=[Depends(require_admin_token)])
+async def list_users(sort: str = "newest", limit: int = 20, cursor: Optional[str] = None,
+                     direction: str = "next", status: Optional[str] = None,
+                     joined_from: Optional[date] = None, joined_to: Optional[date] = None,
+                     has_phone: Optional[bool] = None, owns_startups: Optional[bool] = None):
+    # Keyset pagination: next_cursor/prev_cursor qaytariladi, sahifa raqami yo'q
+    if sort not in storage.USER_SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(storage.USER_SORTS)}")
+    if direction not in ("next", "prev"):
+        raise HTTPException(status_code=400, detail="direction must be next or prev")
+    limit = min(max(limit, 1), USERS_PAGE_MAX)
+    after = decode_page_cursor(cursor, sort) if cursor else None
+    backward = after is not None and direction == "prev"
+    
+    users, has_more = await run_db(
+        storage.get_users_page, sort, after, limit, backward, status,
+        joined_from.isoformat() if joined_from else None,
+        (joined_to + timedelta(days=1)).isoformat() if joined_to else None,
+        has_phone, owns_startups
+    )
+    has_next = has_more if not backward else True
+    has_prev = has_more if backward else after is not None
+    return {
+        "success": True,
+        "data": users,
+        "next_cursor": encode_page_cursor(sort, storage.user_sort_key(users[-1], sort)) if users and has_next else None,
+        "prev_cursor": encode_page_cursor(sort, storage.user_sort_key(users[0], sort)) if users and has_prev else None
+    }
+
+EXPORT_FORMATS = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+def _format_export_batch(columns: List[str], rows: List, fmt: str) -> str:
+    if fmt == "ndjson":
+        return "".join(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in rows)
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+async def _export_stream(table: str, fmt: str, compress: bool):
+    # Har bir partiya db_executor da o'qiladi; javobga bittadan partiya yoziladi
+    batches = storage.iter_export(table)
+    compressor = zlib.compressobj(wbits=31) if compress else None  # 31 - gzip konteyneri
+    
+    def emit(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+    
+    try:
+        columns = await run_db(next, batches)
+        if fmt == "csv":
+            yield emit(_format_export_batch(columns, [columns], fmt))
+        while True:
+            rows = await run_db(next, batches, None)
+            if rows is None:
+                break
+            chunk = emit(_format_export_batch(columns, rows, fmt))
+            if chunk:
+                yield chunk
+        if compressor:
+            yield compressor.flush()
+    finally:
+        await run_db(batches.close)
+
+@app.get("/api/export/{table}", dependencies=[Depends(require_admin_token)])
+async def export_table(table: str, format: str = "csv", gzip: bool = False):
+    if table not in storage.EXPORT_QUERIES:
+        raise HTTPException(status_code=404, detail=f"table must be one of {', '.join(storage.EXPORT_QUERIES)}")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    
+    filename = f"garajhub_{table}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
+    media_type = EXPORT_FORMATS[format]
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        _export_stream(table, format, gzip),
+        media_type=media_type,
+        # Shaxsiy ma'lumot: brauzer va proxy keshida saqlanmasin
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"}
+    )
+
+@app.websocket("/ws")
+async def live_dashboard(websocket: WebSocket):
+    # Brauzer WebSocket ga header qo'sha olmaydi: token ?token= orqali; token sozlanmagan bo'lsa yopiq
+    token = websocket.query_params.get("token", "")
+    if not ADMIN_API_TOKEN or not hmac.compare_digest(token, ADMIN_API_TOKEN):
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    queue = live_feed.subscribe()
+    try:
+        data, _ = await get_cached_statistics()
+        await websocket.send_text(json.dumps({
+            "type": "snapshot",
+            "last_event_id": live_feed.last_event_id,
+            "stats": {**data, "uptime": get_uptime()}
+        }))
+        sender = asyncio.create_task(_ws_send_loop(websocket, queue))
+        try:
+            # Mijoz xabarlari (ping) e'tiborsiz; uzilish shu yerda aniqlanadi
+            while True:
+                await websocket.receive_text()
+        finally:
+            sender.cancel()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        live_feed.unsubscribe(queue)
+
+async def _ws_send_loop(websocket: WebSocket, queue: asyncio.Queue):
+    while True:
+        message = await queue.get()
+        if message is None:
+            await websocket.close(code=1013)
+            return
+        await websocket.send_text(message)
+
+@app.post("/telegram/webhook")
+async def telegram_webhook(request: Request):
+    # Update faqat navbatga yoziladi; handlerlar bot jarayonida (BOT_MODE=webhook) ishlaydi
+    token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+    if not TELEGRAM_WEBHOOK_SECRET or not hmac.compare_digest(token, TELEGRAM_WEBHOOK_SECRET):
+        raise HTTPException(status_code=403, detail="Invalid secret token")
+    
+    body = await request.body()
+    try:
+        update_id = int(json.loads(body)["update_id"])
+        # Bot jarayoni o'qiy olmaydigan update navbatga tushmasin
+        if BOT_AVAILABLE:
+            types.Update.de_json(body.decode("utf-8"))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid update")
+    
+    await run_db(storage.enqueue_update, update_id, body.decode("utf-8"))
+    return {"ok": True}
+
 # other endpoints copied from original server.py continue...
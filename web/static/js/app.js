@@ -15,6 +15,12 @@ const API_BASE_URL =
 	process.env.NEXT_PUBLIC_API_URL || window.location.origin + '/api'
 const WS_URL = window.location.origin.replace('http', 'ws') + '/ws'
 
+// /ws admin tokenni talab qiladi (brauzer WebSocket ga header qo'sha olmaydi)
+function getWsUrl() {
+	const token = currentToken || localStorage.getItem('adminToken') || ''
+	return `${WS_URL}?token=${encodeURIComponent(token)}`
+}
+
 // Dastlabki yuklash
 document.addEventListener('DOMContentLoaded', function () {
 	checkAuthStatus()